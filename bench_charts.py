@@ -0,0 +1,89 @@
+"""בנצ'מרק backends של גרפים: matplotlib מול pillow
+
+הרצה:
+    python bench_charts.py [--renders 10]
+
+כל backend רץ בתהליך נפרד כדי למדוד peak RSS נקי.
+מדווח: זמן import של ה-backend, זמן רינדור (חציון), peak RSS ותוספת ה-RSS של הרינדור, וגודל הקובץ.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKENDS = ('matplotlib', 'pillow')
+
+# רינדור של 30 נרות סינתטיים באותו מסלול שהבוט משתמש בו בשידור
+CHILD_SNIPPET = """
+import json, random, resource, statistics, sys, time
+import bot_only
+
+backend, renders = sys.argv[1], int(sys.argv[2])
+pd = bot_only.load_pandas()
+random.seed(42)
+closes = [100.0]
+for _ in range(29):
+    closes.append(closes[-1] * random.uniform(0.98, 1.02))
+data = pd.DataFrame({
+    'Open': closes,
+    'High': [c * 1.01 for c in closes],
+    'Low': [c * 0.99 for c in closes],
+    'Close': closes,
+    'Volume': [1000000] * len(closes)
+}, index=pd.date_range('2026-01-01', periods=len(closes)))
+price = closes[-1]
+bot = bot_only.PeakTradeBot()
+baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+started = time.perf_counter()
+bot_only.load_pillow() if backend == 'pillow' else bot_only.load_pyplot()
+import_s = time.perf_counter() - started
+
+times = []
+size = 0
+for _ in range(renders):
+    started = time.perf_counter()
+    buffer = bot.create_professional_chart_with_prices(
+        'AAPL', data, price, price * 1.02, price * 0.95, price * 1.08, price * 1.15, backend=backend
+    )
+    times.append(time.perf_counter() - started)
+    size = len(buffer.getvalue())
+
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+bot_only.log_listener.stop()
+print(json.dumps({
+    'import_ms': import_s * 1000,
+    'first_ms': times[0] * 1000,
+    'median_ms': statistics.median(times) * 1000,
+    'peak_rss_mb': peak_kb / 1024,
+    'render_rss_mb': (peak_kb - baseline_kb) / 1024,
+    'bytes': size
+}))
+"""
+
+def measure(backend, renders):
+    """הרצת backend אחד בתהליך נקי והחזרת המדדים"""
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_SNIPPET, backend, str(renders)],
+        cwd=HERE, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--renders', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'backend':<12}{'import ms':>11}{'first ms':>10}{'median ms':>11}{'peak RSS MB':>13}{'render RSS MB':>15}{'bytes':>10}")
+    for backend in BACKENDS:
+        m = measure(backend, args.renders)
+        print(
+            f"{backend:<12}{m['import_ms']:>11.1f}{m['first_ms']:>10.1f}{m['median_ms']:>11.1f}"
+            f"{m['peak_rss_mb']:>13.1f}{m['render_rss_mb']:>15.1f}{m['bytes']:>10,}"
+        )
+
+if __name__ == "__main__":
+    main()
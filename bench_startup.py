@@ -0,0 +1,102 @@
+"""בנצ'מרק זמן עלייה של bot_only.py עם פירוט זמני import
+
+הרצה:
+    python bench_startup.py [--runs 5] [--top 15]
+
+כל מדידה רצה בתהליך Python נקי כדי למדוד cold start אמיתי.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# הזמן עד שהבוט מוכן ל-polling: import + בניית הבוט וה-Application + handlers (בלי רשת)
+READY_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import bot_only
+t1 = time.perf_counter()
+bot = bot_only.PeakTradeBot()
+bot.application = bot_only.Application.builder().token(bot_only.BOT_TOKEN).build()
+bot.setup_handlers()
+t2 = time.perf_counter()
+bot_only.log_listener.stop()
+print(f"{t1 - t0:.6f} {t2 - t0:.6f}")
+"""
+
+# עלות המודולים הכבדים שעברו ל-warm-up ברקע
+DEFERRED_SNIPPET = """
+import time
+import bot_only
+bot_only.log_listener.stop()
+for loader in bot_only.HEAVY_MODULE_LOADERS + (bot_only.load_sheets_client,):
+    t0 = time.perf_counter()
+    loader()
+    print(f"{loader.__name__} {time.perf_counter() - t0:.6f}")
+"""
+
+def run_python(args):
+    """הרצת Python בתהליך נפרד מתיקיית הריפו"""
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    return subprocess.run(
+        [sys.executable, *args], cwd=HERE, env=env,
+        capture_output=True, text=True, check=True
+    )
+
+def measure_ready(runs):
+    """מדידת זמן import וזמן עד מוכנות ל-polling"""
+    import_times, ready_times = [], []
+    for _ in range(runs):
+        out = run_python(['-c', READY_SNIPPET]).stdout.split()
+        import_times.append(float(out[0]))
+        ready_times.append(float(out[1]))
+    return statistics.median(import_times), statistics.median(ready_times)
+
+def measure_deferred():
+    """מדידת זמן הטעינה של כל מודול כבד שנדחה"""
+    out = run_python(['-c', DEFERRED_SNIPPET]).stdout
+    return [(name, float(seconds)) for name, seconds in (line.split() for line in out.splitlines())]
+
+def parse_import_line(line):
+    """פירוק שורה של importtime: self | cumulative | name"""
+    _, cumulative_us, name = line[len('import time:'):].split('|', 2)
+    return int(cumulative_us), name[1:]
+
+def import_time_breakdown(top):
+    """פירוק זמני import לפי חבילות top-level מתוך python -X importtime"""
+    stderr = run_python(['-X', 'importtime', '-c', 'import bot_only; bot_only.log_listener.stop()']).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        cumulative_us, name = parse_import_line(line)
+        # רק imports ישירים של bot_only (הזחה אחת) - הזמן המצטבר שלהם כבר כולל את התלויות
+        if len(name) - len(name.lstrip()) != 2:
+            continue
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + cumulative_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    import_s, ready_s = measure_ready(args.runs)
+    print(f"bot_only import (median of {args.runs}): {import_s * 1000:8.1f} ms")
+    print(f"ready to poll   (median of {args.runs}): {ready_s * 1000:8.1f} ms")
+
+    print("\nDeferred to background warm-up:")
+    for name, seconds in measure_deferred():
+        print(f"  {name:<22} {seconds * 1000:8.1f} ms")
+
+    print(f"\nImport-time breakdown (top {args.top}, cumulative):")
+    for package, cumulative_us in import_time_breakdown(args.top):
+        print(f"  {package:<22} {cumulative_us / 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,127 @@
 import logging
+import logging.handlers
 import os
 import asyncio
 import json
+import queue
+import time
+
+PROCESS_STARTED = time.perf_counter()
+from collections import deque
 from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler, CallbackQueryHandler
-from telegram.error import TelegramError
-import gspread
-from google.oauth2.service_account import Credentials
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler, CallbackQueryHandler, ChatMemberHandler
+from telegram.error import TelegramError, RetryAfter, Forbidden
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
-import matplotlib.pyplot as plt
+from apscheduler.triggers.interval import IntervalTrigger
 import io
+import heapq
+import itertools
 import random
 import requests
-import pandas as pd
-
-# הגדרת לוגינג
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+import socket
+import sqlite3
+import string
+import zlib
+import threading
+import multiprocessing
+from decimal import Decimal, InvalidOperation
+from urllib.parse import parse_qsl, urlencode
+
+# הגדרות לוגינג
+LOG_LEVEL = os.getenv('LOG_LEVEL') or "INFO"
+LOG_FORMAT = os.getenv('LOG_FORMAT') or "json"  # json / text
+LOG_FILE = os.getenv('LOG_FILE')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES') or 10 * 1024 * 1024)
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT') or 5)
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE') or 0.1)
+LOG_SAMPLED_LOGGERS = ('httpx',)
+LOG_CONTEXT_FIELDS = ('user_id', 'symbol', 'job', 'latency_ms')
+
+class JsonLogFormatter(logging.Formatter):
+    """פורמט JSON מובנה עם שדות הקשר (user_id, symbol, job, latency_ms)"""
+
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for field in LOG_CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+class LogSampler(logging.Filter):
+    """דגימת אירועים בנפח גבוה - מעביר רשומה אחת מכל N לכל מפתח דגימה"""
+
+    def __init__(self, rate, sampled_loggers=()):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.sampled_loggers = tuple(sampled_loggers)
+        self.counters = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = getattr(record, 'sample', None)
+        if key is None and record.name.startswith(self.sampled_loggers):
+            key = record.name
+        if key is None:
+            return True
+        if not self.every:
+            return False
+        count = self.counters.get(key, 0)
+        self.counters[key] = count + 1
+        return count % self.every == 0
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler שלא מפרמט את ההודעה ב-event loop - הפרמוט נעשה ב-thread של ה-listener"""
+
+    def prepare(self, record):
+        return record
+
+def log_file_path():
+    """במצב cluster לכל worker קובץ משלו (bot.worker-1.log) - RotatingFileHandler לא בטוח בין תהליכים"""
+    worker_index = os.getenv('WORKER_INDEX')
+    if worker_index is None:
+        return LOG_FILE
+    base, extension = os.path.splitext(LOG_FILE)
+    return f"{base}.worker-{worker_index}{extension}"
+
+def setup_logging():
+    """הגדרת לוגינג אסינכרוני: QueueHandler ב-hot path, כתיבה בפועל ב-QueueListener"""
+    if LOG_FORMAT == 'json':
+        formatter = JsonLogFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        os.makedirs(os.path.dirname(LOG_FILE) or '.', exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file_path(), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(LogSampler(LOG_SAMPLE_RATE, LOG_SAMPLED_LOGGERS))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
 # הגדרות המערכת
@@ -34,57 +135,261 @@ TWELVE_DATA_API_KEY = os.getenv('TWELVE_DATA_API_KEY') or "fb6b77ae35bc44e0a0837
 PAYPAL_PAYMENT_LINK = "https://www.paypal.com/ncp/payment/LYPU8NUFJB7XW"
 MONTHLY_PRICE = 120
 
+# אימות תשלומים אוטומטי (IPN / webhooks של PayPal)
+PAYMENT_SERVER_PORT = os.getenv('PAYMENT_SERVER_PORT') or os.getenv('PORT')  # ריק = השרת כבוי
+PAYPAL_BUSINESS_EMAIL = os.getenv('PAYPAL_BUSINESS_EMAIL')  # מאפשר קישור תשלום אישי עם telegram_user_id
+PAYPAL_IPN_NOTIFY_URL = os.getenv('PAYPAL_IPN_NOTIFY_URL')
+PAYPAL_IPN_VERIFY_URL = os.getenv('PAYPAL_IPN_VERIFY_URL') or "https://ipnpb.paypal.com/cgi-bin/webscr"
+PAYPAL_API_BASE = os.getenv('PAYPAL_API_BASE') or "https://api-m.paypal.com"
+PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID')
+PAYPAL_CLIENT_SECRET = os.getenv('PAYPAL_CLIENT_SECRET')
+PAYPAL_WEBHOOK_ID = os.getenv('PAYPAL_WEBHOOK_ID')
+PAYMENT_CURRENCY = "ILS"
+PAYMENT_BATCH_INTERVAL = 5
+PAYMENT_RETRY_SECONDS = 60  # תשלום שלא נכתב לגיליון חוזר לתור
+PAYMENT_MAX_BODY = 64 * 1024
+
+# תבניות הודעה - templates/<שפה>/<שם>.txt, וריאנט A/B נוסף בשם <שם>.<וריאנט>.txt
+TEMPLATES_DIR = os.getenv('TEMPLATES_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+DEFAULT_LANGUAGE = os.getenv('DEFAULT_LANGUAGE') or "he"
+CHANNEL_LANGUAGE = os.getenv('CHANNEL_LANGUAGE') or DEFAULT_LANGUAGE
+TEMPLATE_RELOAD_SECONDS = 5
+
+# מנוע מחזור חיי מנוי
+TRIAL_DAYS = 7
+SUBSCRIPTION_DAYS = 30
+# קריאה מלאה של הגיליון פעם ביום, או לפי /resync של מנהל אחרי עריכה ידנית
+LIFECYCLE_RESYNC_HOURS = int(os.getenv('LIFECYCLE_RESYNC_HOURS') or 24)
+ADMIN_USER_IDS = {int(user_id) for user_id in (os.getenv('ADMIN_USER_IDS') or '').split(',') if user_id.strip()}
+LIFECYCLE_MAX_SLEEP = 300
+LIFECYCLE_RETRY_SECONDS = 30  # בנייה מחדש שנכשלה חוזרת אחרי 30, 60, 120... שניות עד LIFECYCLE_MAX_SLEEP
+
+# התאמת חברות בערוץ מול מאגר המנויים
+ACTIVE_STATUSES = ('trial_active', 'paid_subscriber')
+RECONCILE_INTERVAL_HOURS = int(os.getenv('RECONCILE_INTERVAL_HOURS') or 6)
+RECONCILE_APPLY = (os.getenv('RECONCILE_APPLY') or "true").lower() == "true"
+RECONCILE_BATCH_SIZE = 20
+RECONCILE_RATE_PER_SECOND = 20
+
+# התראות watchlist ב-DM: חלון איחוד, קצב שליחה (מגבלת טלגרם ~30 הודעות לשנייה) ומספר שולחים במקביל
+WATCHLIST_MAX_SYMBOLS = 20
+WATCHLIST_COALESCE_SECONDS = int(os.getenv('WATCHLIST_COALESCE_SECONDS') or 60)
+WATCHLIST_RATE_PER_SECOND = int(os.getenv('WATCHLIST_RATE_PER_SECOND') or 25)
+WATCHLIST_SENDERS = 20
+
 # מצבי השיחה
 WAITING_FOR_EMAIL = 1
 
+# זמן המתנה מקסימלי לחיבור Google Sheets ברישום משתמש (שניות)
+SHEETS_READY_TIMEOUT = 15
+
+# מודולים כבדים (pandas, matplotlib, gspread) נטענים רק בשימוש ראשון או ב-warm-up ברקע,
+# כדי שהבוט יתחיל polling מיד אחרי עלייה
+def load_pandas():
+    """טעינה עצלה של pandas"""
+    import pandas
+    return pandas
+
+def load_pyplot():
+    """טעינה עצלה של matplotlib עם backend ללא תצוגה"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot
+    return matplotlib.pyplot
+
+def load_pillow():
+    """טעינה עצלה של Pillow (backend הגרפים הקל)"""
+    from PIL import Image, ImageDraw, ImageFont
+    return Image, ImageDraw, ImageFont
+
+def load_sheets_client():
+    """טעינה עצלה של gspread ו-google-auth"""
+    import gspread
+    from google.oauth2.service_account import Credentials
+    return gspread, Credentials
+
+# backend לגרפים: matplotlib (ברירת מחדל) או pillow - ציור ישיר ל-buffer בגודל שטלגרם מציג
+CHART_BACKEND = os.getenv('CHART_BACKEND') or "matplotlib"
+CHART_FORMAT = os.getenv('CHART_FORMAT') or "jpeg"  # jpeg / png (רק ל-pillow)
+CHART_SIZE = (1280, 914)
+
+HEAVY_MODULE_LOADERS = (load_pandas, load_pillow if CHART_BACKEND == 'pillow' else load_pyplot)
+
+# timeframes (שמות כמו ב-Twelve Data, ערך = אורך הנר בשניות) - ה-intraday נגזרים מנרות דקה, 1day בבקשה ישירה
+TIMEFRAMES = {'1min': 60, '5min': 300, '15min': 900, '1h': 3600, '1day': 86400}
+INTRADAY_TIMEFRAMES = ('1min', '5min', '15min', '1h')
+SIGNAL_TIMEFRAME = os.getenv('SIGNAL_TIMEFRAME') or "1day"
+# תוויות הגרף (באנגלית) לכל timeframe
+TIMEFRAME_LABELS = {'1min': '1-Minute', '5min': '5-Minute', '15min': '15-Minute', '1h': 'Hourly', '1day': 'Daily'}
+BAR_HISTORY = int(os.getenv('BAR_HISTORY') or 200)  # נרות לכל timeframe ב-buffer
+MINUTE_SEED_SIZE = int(os.getenv('MINUTE_SEED_SIZE') or 1900)  # מספיק ל-30 נרות שעה (מקסימום Twelve Data: 5000)
+MINUTE_REFRESH_SECONDS = int(os.getenv('MINUTE_REFRESH_SECONDS') or 60)
+
+# הגדרות cluster - כמה workers שחולקים updates ו-store משותף ב-SQLite
+WORKER_COUNT = int(os.getenv('WORKER_COUNT') or 1)
+WORKER_INDEX = os.getenv('WORKER_INDEX')  # ריק = התהליך הראשי מפעיל בעצמו WORKER_COUNT workers
+CLUSTER_DB_PATH = os.getenv('CLUSTER_DB_PATH') or "peaktrade_cluster.db"
+LEADER_LEASE_SECONDS = int(os.getenv('LEADER_LEASE_SECONDS') or 30)
+UPDATE_POLL_TIMEOUT = 10
+UPDATE_FETCH_INTERVAL = 0.5
+JOB_RUN_RETENTION_DAYS = 7  # חלונות jobs ישנים נמחקים מ-job_runs
+
+class BarSeries:
+    """buffer מתגלגל של נרות ב-timeframe אחד, מתעדכן מנרות דקה בלי לחשב מחדש את ההיסטוריה"""
+
+    def __init__(self, period, maxlen=BAR_HISTORY):
+        self.period = period
+        self.bars = deque(maxlen=maxlen)  # [start, open, high, low, close, volume]
+        self.floor = None  # הדלי הראשון ב-seed חלקי - מדלגים עליו
+        self.base = None  # הנר הפתוח בלי הדקה האחרונה
+        self.pending = None  # הדקה האחרונה - Twelve Data עדיין מעדכן אותה עד שהיא נסגרת
+
+    def bucket(self, moment):
+        """תחילת הנר שהרגע הזה שייך אליו (לפי שעון הבורסה, מחצות)"""
+        seconds = moment.hour * 3600 + moment.minute * 60 + moment.second
+        return moment.replace(microsecond=0) - timedelta(seconds=seconds % self.period)
+
+    @staticmethod
+    def merge(first, second):
+        """איחוד שני נרות עוקבים"""
+        if first is None:
+            return list(second)
+        return [first[0], first[1], max(first[2], second[2]), min(first[3], second[3]), second[4], first[5] + second[5]]
+
+    def add(self, minute):
+        """עדכון הנר הפתוח בדקה חדשה (או בגרסה מעודכנת של הדקה האחרונה) - O(1)"""
+        start = self.bucket(minute[0])
+        if self.floor is not None and start <= self.floor:
+            return
+        if self.bars and start < self.bars[-1][0]:
+            return
+        if self.bars and start == self.bars[-1][0]:
+            if minute[0] < self.pending[0]:
+                return
+            if minute[0] > self.pending[0]:
+                self.base = self.merge(self.base, self.pending)
+            self.pending = minute
+            self.bars[-1] = [start] + self.merge(self.base, minute)[1:]
+        else:
+            self.base = None
+            self.pending = minute
+            self.bars.append([start] + list(minute[1:]))
+
+    def tail(self, count):
+        return list(self.bars)[-count:]
+
+class SymbolBars:
+    """כל ה-timeframes התוך-יומיים של סימבול אחד, נגזרים מזרם אחד של נרות דקה"""
+
+    def __init__(self, minutes):
+        self.series = {name: BarSeries(TIMEFRAMES[name]) for name in INTRADAY_TIMEFRAMES}
+        for series in self.series.values():
+            if series.period > TIMEFRAMES['1min']:
+                series.floor = series.bucket(minutes[0][0])
+        self.refreshed_at = time.monotonic()
+        self.add_minutes(minutes)
+
+    @property
+    def last_minute(self):
+        return self.series['1min'].bars[-1][0]
+
+    def add_minutes(self, minutes):
+        for minute in minutes:
+            for series in self.series.values():
+                series.add(minute)
+
 class TwelveDataAPI:
     def __init__(self, api_key):
         self.api_key = api_key
         self.base_url = "https://api.twelvedata.com"
+        self.bars = {}  # symbol -> SymbolBars, רק לסימבולים שביקשו מהם timeframe תוך-יומי
+        self.lock = threading.Lock()  # הקריאות רצות ב-asyncio.to_thread
+    
+    def fetch_series(self, symbol, interval, outputsize, **params):
+        """בקשת time_series אחת - נרות [datetime, open, high, low, close, volume] מהישן לחדש"""
+        url = f"{self.base_url}/time_series"
+        params.update({
+            'symbol': symbol,
+            'interval': interval,
+            'outputsize': outputsize,
+            'apikey': self.api_key
+        })
+        
+        response = requests.get(url, params=params)
+        data = response.json()
+        
+        return [
+            [
+                datetime.fromisoformat(item['datetime']),
+                float(item['open']),
+                float(item['high']),
+                float(item['low']),
+                float(item['close']),
+                int(float(item.get('volume') or 0))
+            ]
+            for item in reversed(data.get('values') or [])
+        ]
     
-    def get_stock_data(self, symbol):
-        """קבלת נתוני מניה מ-Twelve Data API עם requests"""
+    def refresh_bars(self, symbol):
+        """seed של נרות דקה פעם אחת, ואחר כך רק הדקות החדשות - בקשה אחת לכל ה-timeframes התוך-יומיים"""
+        bars = self.bars.get(symbol)
+        if bars is not None and time.monotonic() - bars.refreshed_at < MINUTE_REFRESH_SECONDS:
+            return bars
+        
         try:
-            url = f"{self.base_url}/time_series"
-            params = {
-                'symbol': symbol,
-                'interval': '1day',
-                'outputsize': 30,
-                'apikey': self.api_key
-            }
+            params = {'start_date': bars.last_minute.strftime('%Y-%m-%d %H:%M:%S')} if bars else {}
+            minutes = self.fetch_series(symbol, '1min', MINUTE_SEED_SIZE, **params)
+        except Exception as e:
+            if bars is None:
+                raise
+            logger.error("Twelve Data refresh error for %s: %s", symbol, e, extra={'symbol': symbol})
+            return bars
+        
+        if bars is not None and len(minutes) < MINUTE_SEED_SIZE:
+            bars.add_minutes(minutes)
+            bars.refreshed_at = time.monotonic()
+            return bars
+        if not minutes:
+            return bars
+        # seed ראשון, או תשובה מלאה אחרי פער ארוך - הדקות האחרונות שכבר הגיעו הן ה-seed החדש
+        bars = self.bars[symbol] = SymbolBars(minutes)
+        logger.info("✅ Twelve Data minute bars seeded for %s: %s bars", symbol, len(minutes), extra={'symbol': symbol})
+        return bars
+    
+    def to_frame(self, rows):
+        pd = load_pandas()
+        df = pd.DataFrame([row[1:] for row in rows], columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        df.index = pd.DatetimeIndex([row[0] for row in rows])
+        return df
+    
+    def get_stock_data(self, symbol, timeframe=None, outputsize=30):
+        """נרות מניה מ-Twelve Data: 1day בבקשה ישירה (קרדיט אחד), intraday מ-cache של נרות דקה (חוסם - להריץ ב-thread)"""
+        timeframe = timeframe or SIGNAL_TIMEFRAME
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        try:
+            if timeframe == '1day':
+                rows = self.fetch_series(symbol, '1day', outputsize)
+            else:
+                with self.lock:
+                    bars = self.refresh_bars(symbol)
+                    rows = bars.series[timeframe].tail(outputsize) if bars else []
             
-            response = requests.get(url, params=params)
-            data = response.json()
+            if rows:
+                logger.info("✅ Twelve Data retrieved for %s: %s x %s", symbol, len(rows), timeframe, extra={'symbol': symbol})
+                return self.to_frame(rows)
             
-            if 'values' in data and data['values']:
-                df_data = []
-                for item in data['values']:
-                    df_data.append({
-                        'Open': float(item['open']),
-                        'High': float(item['high']),
-                        'Low': float(item['low']),
-                        'Close': float(item['close']),
-                        'Volume': int(item['volume'])
-                    })
-                
-                df = pd.DataFrame(df_data)
-                dates = [datetime.strptime(item['datetime'], '%Y-%m-%d') for item in data['values']]
-                df.index = pd.DatetimeIndex(dates)
-                df = df.sort_index()
-                
-                logger.info(f"✅ Twelve Data retrieved for {symbol}: {len(df)} days")
-                return df
-            else:
-                logger.error(f"No Twelve Data for {symbol}")
-                return self.get_stock_quote(symbol)
+            logger.error("No Twelve Data for %s", symbol, extra={'symbol': symbol})
+            return self.get_stock_quote(symbol)
                 
         except Exception as e:
-            logger.error(f"Twelve Data error for {symbol}: {e}")
+            logger.error("Twelve Data error for %s: %s", symbol, e, extra={'symbol': symbol})
             return self.get_stock_quote(symbol)
     
     def get_stock_quote(self, symbol):
         """קבלת מחיר נוכחי מ-Twelve Data"""
         try:
+            pd = load_pandas()
             url = f"{self.base_url}/price"
             params = {
                 'symbol': symbol,
@@ -117,29 +422,1444 @@ class TwelveDataAPI:
                 df.index = pd.DatetimeIndex(dates)
                 df.iloc[-1, df.columns.get_loc('Close')] = current_price
                 
-                logger.info(f"✅ Twelve Data quote used for {symbol}: ${current_price}")
+                logger.info("✅ Twelve Data quote used for %s: $%s", symbol, current_price, extra={'symbol': symbol})
                 return df
             else:
-                logger.error(f"No price data for {symbol}")
+                logger.error("No price data for %s", symbol, extra={'symbol': symbol})
                 return None
                 
         except Exception as e:
-            logger.error(f"Twelve Data quote error for {symbol}: {e}")
+            logger.error("Twelve Data quote error for %s: %s", symbol, e, extra={'symbol': symbol})
             return None
 
+class PillowChartRenderer:
+    """ציור אותו layout של הגרף ישירות לתמונה ב-Pillow, בגודל שטלגרם מציג (בלי matplotlib)"""
+
+    BACKGROUND = (26, 26, 26)
+    PLOT_BACKGROUND = (10, 10, 10)
+    GRID = (58, 58, 58)
+    MARGINS = (110, 80, 40, 70)  # שמאל, למעלה, ימין, למטה
+    FONT_FILES = {False: 'DejaVuSans.ttf', True: 'DejaVuSans-Bold.ttf'}
+    fonts = {}
+
+    def __init__(self, size=CHART_SIZE, image_format=CHART_FORMAT):
+        self.Image, self.ImageDraw, self.ImageFont = load_pillow()
+        self.width, self.height = size
+        self.image_format = image_format
+
+    def font(self, size, bold=False):
+        """פונט TrueType (עם cache), או פונט ברירת המחדל של Pillow אם DejaVu לא מותקן"""
+        key = (size, bold)
+        if key not in self.fonts:
+            try:
+                self.fonts[key] = self.ImageFont.truetype(self.FONT_FILES[bold], size)
+            except OSError:
+                self.fonts[key] = self.ImageFont.load_default(size=size)
+        return self.fonts[key]
+
+    def render(self, symbol, dates, lows, highs, closes, levels):
+        """levels: רשימת (מפתח, תווית, מחיר, צבע, סגנון, עובי) - המפתחות entry/stop/target2 מגדירים את אזורי הרווח והסיכון"""
+        left, top, right, bottom = self.MARGINS
+        plot = (left, top, self.width - right, self.height - bottom)
+        prices = {key: price for key, _, price, *_ in levels}
+
+        low = min(min(lows), *prices.values())
+        high = max(max(highs), *prices.values())
+        padding = (high - low) * 0.05 or 1
+        low, high = low - padding, high + padding
+
+        def x_at(i):
+            return plot[0] + (plot[2] - plot[0]) * i / max(1, len(closes) - 1)
+
+        def y_at(price):
+            return plot[3] - (plot[3] - plot[1]) * (price - low) / (high - low)
+
+        image = self.Image.new('RGB', (self.width, self.height), self.BACKGROUND)
+        draw = self.ImageDraw.Draw(image)
+        draw.rectangle(plot, fill=self.PLOT_BACKGROUND)
+
+        # רשת ותוויות צירים
+        small = self.font(18)
+        for i in range(7):
+            price = low + (high - low) * i / 6
+            y = y_at(price)
+            draw.line((plot[0], y, plot[2], y), fill=self.GRID, width=1)
+            draw.text((plot[0] - 10, y), f"{price:.2f}", fill='white', font=small, anchor='rm')
+        step = max(1, len(dates) // 6)
+        date_format = '%m-%d %H:%M' if len(dates) > 1 and dates[1] - dates[0] < timedelta(days=1) else '%m-%d'
+        for i in range(0, len(dates), step):
+            x = x_at(i)
+            draw.line((x, plot[1], x, plot[3]), fill=self.GRID, width=1)
+            draw.text((x, plot[3] + 10), dates[i].strftime(date_format), fill='white', font=small, anchor='mt')
+
+        # אזורי רווח/סיכון וטווח יומי - שכבה שקופה אחת
+        overlay = self.Image.new('RGBA', image.size, (0, 0, 0, 0))
+        overlay_draw = self.ImageDraw.Draw(overlay)
+        overlay_draw.rectangle((plot[0], y_at(prices['target2']), plot[2], y_at(prices['entry'])), fill=(0, 128, 0, 38))
+        overlay_draw.rectangle((plot[0], y_at(prices['entry']), plot[2], y_at(prices['stop'])), fill=(255, 0, 0, 38))
+        band = [(x_at(i), y_at(v)) for i, v in enumerate(highs)] + [(x_at(i), y_at(v)) for i, v in reversed(list(enumerate(lows)))]
+        overlay_draw.polygon(band, fill=(128, 128, 128, 51))
+        image = self.Image.alpha_composite(image.convert('RGBA'), overlay).convert('RGB')
+        draw = self.ImageDraw.Draw(image)
+
+        # קווי מחיר אופקיים
+        for _, _, price, color, style, width in levels:
+            y = y_at(price)
+            if style == '-':
+                draw.line((plot[0], y, plot[2], y), fill=color, width=width)
+            else:
+                dash, gap = (18, 10) if style == '--' else (4, 8)
+                for x in range(plot[0], plot[2], dash + gap):
+                    draw.line((x, y, min(x + dash, plot[2]), y), fill=color, width=width)
+
+        draw.line([(x_at(i), y_at(v)) for i, v in enumerate(closes)], fill='white', width=3, joint='curve')
+
+        # כותרת, סימני מים ומקרא
+        draw.text((self.width / 2, top / 2), f"{symbol} - PeakTrade VIP Analysis", fill='white', font=self.font(32, True), anchor='mm')
+        draw.text((plot[0] + 12, plot[1] + 10), 'PeakTrade VIP', fill='cyan', font=self.font(26, True))
+        draw.text((plot[0] + 12, plot[3] - 10), 'Professional Analysis', fill='lime', font=self.font(20, True), anchor='ls')
+        legend_font = self.font(18)
+        legend_y = plot[1] + 48
+        for _, label, _, color, _, _ in levels:
+            draw.rectangle((plot[0] + 14, legend_y + 6, plot[0] + 38, legend_y + 12), fill=color)
+            draw.text((plot[0] + 46, legend_y), label, fill='white', font=legend_font)
+            legend_y += 26
+
+        buffer = io.BytesIO()
+        if self.image_format == 'png':
+            image.save(buffer, format='PNG', optimize=True)
+        else:
+            image.save(buffer, format='JPEG', quality=85, optimize=True)
+        buffer.seek(0)
+        return buffer
+
+class ClusterStore:
+    """store משותף ב-SQLite לכל ה-workers: leases, ריצות jobs ותור updates"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS job_runs (
+            job TEXT NOT NULL,
+            slot TEXT NOT NULL,
+            holder TEXT NOT NULL,
+            claimed_at REAL NOT NULL,
+            PRIMARY KEY (job, slot)
+        );
+        CREATE TABLE IF NOT EXISTS updates (
+            update_id INTEGER PRIMARY KEY,
+            shard INTEGER NOT NULL,
+            payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS updates_shard ON updates (shard, update_id);
+        CREATE INDEX IF NOT EXISTS job_runs_claimed ON job_runs (claimed_at);
+        CREATE TABLE IF NOT EXISTS kv (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS channel_members (
+            user_id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS subscriber_prefs (
+            user_id TEXT PRIMARY KEY,
+            language TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS payments (
+            txn_id TEXT PRIMARY KEY,
+            user_id TEXT,
+            amount TEXT,
+            received_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS payment_inbox (
+            txn_id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            received_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS watchlist (
+            symbol TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (symbol, user_id)
+        );
+        CREATE INDEX IF NOT EXISTS watchlist_user ON watchlist (user_id);
+    """
+
+    def __init__(self, path, holder):
+        self.holder = holder
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def transaction(self, fn):
+        """הרצת fn בתוך טרנזקציה כותבת (BEGIN IMMEDIATE) - נעילה אחת לכל ה-cluster"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self.conn)
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def try_acquire_lease(self, name, ttl):
+        """לקיחה או חידוש של lease - מצליח רק אם פנוי, פג תוקף או כבר שלנו"""
+        def acquire(conn):
+            now = time.time()
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != self.holder and row[1] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                (name, self.holder, now + ttl)
+            )
+            return True
+        return self.transaction(acquire)
+
+    def release_lease(self, name):
+        """שחרור lease שלנו כדי ש-worker אחר יוכל לקחת מיד"""
+        self.transaction(lambda conn: conn.execute(
+            "DELETE FROM leases WHERE name = ? AND holder = ?", (name, self.holder)
+        ))
+
+    def claim_job_run(self, job, slot):
+        """תפיסת ריצה של job לחלון זמן - רק worker אחד בכל ה-cluster יקבל True"""
+        def claim(conn):
+            now = time.time()
+            # חלונות ישנים כבר לא ייתפסו שוב - מחיקה כדי שהטבלה לא תגדל בלי סוף
+            conn.execute("DELETE FROM job_runs WHERE claimed_at < ?", (now - JOB_RUN_RETENTION_DAYS * 86400,))
+            return conn.execute(
+                "INSERT OR IGNORE INTO job_runs (job, slot, holder, claimed_at) VALUES (?, ?, ?, ?)",
+                (job, slot, self.holder, now)
+            ).rowcount == 1
+        return self.transaction(claim)
+
+    def get_value(self, key, default=None):
+        """קריאת ערך מטבלת kv"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_value(self, key, value):
+        """כתיבת ערך לטבלת kv"""
+        self.transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)", (key, str(value))
+        ))
+
+    def enqueue_updates(self, rows, next_offset, lease):
+        """שמירת updates לתור המשותף יחד עם ה-offset הבא, באותה טרנזקציה.
+        רק אם ה-lease עדיין שלנו, ורק updates שמעבר ל-offset הנוכחי - ה-offset לא זז אחורה"""
+        def enqueue(conn):
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (lease,)).fetchone()
+            if not row or row[0] != self.holder or row[1] <= time.time():
+                return False
+            current = conn.execute("SELECT value FROM kv WHERE key = 'update_offset'").fetchone()
+            current = int(current[0]) if current else 0
+            conn.executemany(
+                "INSERT OR IGNORE INTO updates (update_id, shard, payload) VALUES (?, ?, ?)",
+                [item for item in rows if item[0] >= current]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value) VALUES ('update_offset', ?)",
+                (str(max(current, next_offset)),)
+            )
+            return True
+        return self.transaction(enqueue)
+
+    def save_pending_payment(self, payment):
+        """שמירת תשלום מאומת לפני התשובה ל-PayPal, כדי שקריסה לא תאבד אותו - רק אם עוד לא טופל"""
+        self.transaction(lambda conn: conn.execute(
+            "INSERT OR IGNORE INTO payment_inbox (txn_id, payload, received_at) "
+            "SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM payments WHERE txn_id = ?)",
+            (payment['txn_id'], json.dumps(payment), time.time(), payment['txn_id'])
+        ))
+
+    def pending_payments(self):
+        """התשלומים שנשמרו ועדיין לא נרשמו כמטופלים, לפי סדר ההגעה"""
+        with self.lock:
+            rows = self.conn.execute("SELECT payload FROM payment_inbox ORDER BY received_at").fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    def record_payment(self, txn_id, user_id, amount):
+        """רישום עסקה והוצאתה מה-inbox - False אם כבר טופלה (PayPal שולח IPN שוב עד שמקבל 200)"""
+        def record(conn):
+            conn.execute("DELETE FROM payment_inbox WHERE txn_id = ?", (txn_id,))
+            return conn.execute(
+                "INSERT OR IGNORE INTO payments (txn_id, user_id, amount, received_at) VALUES (?, ?, ?, ?)",
+                (txn_id, str(user_id or ''), str(amount or ''), time.time())
+            ).rowcount == 1
+        return self.transaction(record)
+
+    def known_payments(self, txn_ids):
+        """העסקאות מתוך הרשימה שכבר טופלו"""
+        with self.lock:
+            return {
+                row[0] for start in range(0, len(txn_ids), 500)
+                for row in self.conn.execute(
+                    f"SELECT txn_id FROM payments WHERE txn_id IN ({','.join('?' * len(txn_ids[start:start + 500]))})",
+                    txn_ids[start:start + 500]
+                )
+            }
+
+    def last_payments(self):
+        """זמן התשלום האחרון לכל משתמש"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT user_id, MAX(received_at) FROM payments WHERE user_id != '' GROUP BY user_id"
+            ).fetchall()
+        return dict(rows)
+
+    def set_member_statuses(self, statuses):
+        """עדכון סטטוס חברות בערוץ (member / left / kicked) לרשימת משתמשים"""
+        now = time.time()
+        self.transaction(lambda conn: conn.executemany(
+            "INSERT OR REPLACE INTO channel_members (user_id, status, updated_at) VALUES (?, ?, ?)",
+            [(int(user_id), status, now) for user_id, status in statuses]
+        ))
+
+    def member_snapshot(self):
+        """קבוצות המשתמשים שנמצאים בערוץ ושחסומים בו, לפי אירועי chat_member"""
+        with self.lock:
+            rows = self.conn.execute("SELECT user_id, status FROM channel_members").fetchall()
+        members = {user_id for user_id, status in rows if status == 'member'}
+        banned = {user_id for user_id, status in rows if status == 'kicked'}
+        return members, banned
+
+    def set_language(self, user_id, language):
+        """שמירת שפת ההודעות של מנוי"""
+        self.transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO subscriber_prefs (user_id, language) VALUES (?, ?)",
+            (str(user_id), language)
+        ))
+
+    def get_languages(self, user_ids):
+        """שפות ההודעות של רשימת מנויים (מי שלא מופיע - שפת ברירת מחדל)"""
+        keys = [str(user_id) for user_id in user_ids]
+        result = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                result.update(self.conn.execute(
+                    f"SELECT user_id, language FROM subscriber_prefs WHERE user_id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+        return result
+
+    def bump_watchlist_version(self, conn):
+        """כל שינוי ב-watchlist מעלה גרסה - כך כל worker יודע מתי לטעון מחדש את האינדקס"""
+        conn.execute(
+            "INSERT INTO kv (key, value) VALUES ('watchlist_version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def add_watch(self, user_id, symbols, limit):
+        """הוספת סימבולים למעקב של משתמש (עד limit) - מחזיר את הרשימה המלאה אחרי העדכון"""
+        def add(conn):
+            watching = [row[0] for row in conn.execute("SELECT symbol FROM watchlist WHERE user_id = ?", (user_id,))]
+            added = [symbol for symbol in dict.fromkeys(symbols) if symbol not in watching][:max(0, limit - len(watching))]
+            if added:
+                conn.executemany("INSERT INTO watchlist (symbol, user_id) VALUES (?, ?)", [(symbol, user_id) for symbol in added])
+                self.bump_watchlist_version(conn)
+            return sorted(watching + added)
+        return self.transaction(add)
+
+    def remove_watch(self, user_ids, symbols=None):
+        """הסרת סימבולים מהמעקב, או את כל המעקב של המשתמשים (symbols=None)"""
+        def remove(conn):
+            if symbols is None:
+                removed = conn.executemany("DELETE FROM watchlist WHERE user_id = ?", [(user_id,) for user_id in user_ids]).rowcount
+            else:
+                removed = conn.executemany(
+                    "DELETE FROM watchlist WHERE user_id = ? AND symbol = ?",
+                    [(user_id, symbol) for user_id in user_ids for symbol in symbols]
+                ).rowcount
+            if removed:
+                self.bump_watchlist_version(conn)
+            return removed
+        return self.transaction(remove)
+
+    def watched_symbols(self, user_id):
+        """הסימבולים שמשתמש עוקב אחריהם"""
+        with self.lock:
+            rows = self.conn.execute("SELECT symbol FROM watchlist WHERE user_id = ? ORDER BY symbol", (user_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def watchlist_index(self):
+        """אינדקס הפוך symbol -> קבוצת משתמשים, יחד עם הגרסה שלו"""
+        index = {}
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                row = self.conn.execute("SELECT value FROM kv WHERE key = 'watchlist_version'").fetchone()
+                for symbol, user_id in self.conn.execute("SELECT symbol, user_id FROM watchlist"):
+                    index.setdefault(symbol, set()).add(user_id)
+            finally:
+                self.conn.execute("COMMIT")
+        return (row[0] if row else '0'), index
+
+    def peek_updates(self, shard, limit=100):
+        """updates של shard אחד לפי סדר, בלי למחוק - נמחקים רק אחרי טיפול (ack_update)"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT update_id, payload FROM updates WHERE shard = ? ORDER BY update_id LIMIT ?",
+                (shard, limit)
+            ).fetchall()
+
+    def ack_update(self, update_id):
+        """מחיקת update שטופל - worker שקרס באמצע יקבל אותו שוב אחרי restart"""
+        self.transaction(lambda conn: conn.execute("DELETE FROM updates WHERE update_id = ?", (update_id,)))
+
+class ClusterCoordinator:
+    """בחירת מנהיג מבוססת lease, כדי ש-jobs מתוזמנים ירוצו פעם אחת בכל ה-cluster"""
+
+    LEADER_LEASE = 'leader'
+
+    def __init__(self, store, worker_index, worker_count, lease_seconds=LEADER_LEASE_SECONDS):
+        self.store = store
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self.lease_seconds = lease_seconds
+        self.is_leader = False
+
+    async def refresh_leadership(self):
+        """ניסיון לקחת/לחדש את ה-lease ועדכון is_leader"""
+        try:
+            acquired = await asyncio.to_thread(self.store.try_acquire_lease, self.LEADER_LEASE, self.lease_seconds)
+        except sqlite3.Error as e:
+            logger.error("❌ Error refreshing leader lease: %s", e)
+            acquired = False
+        if acquired != self.is_leader:
+            logger.info("👑 Worker %s leadership: %s", self.worker_index, acquired, extra={'job': 'leader_election'})
+        self.is_leader = acquired
+        return acquired
+
+    async def run_lease_loop(self):
+        """חידוש ה-lease כל שליש מזמן התפוגה"""
+        while True:
+            await self.refresh_leadership()
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def claim(self, job, slot):
+        """האם ה-worker הזה צריך להריץ את job בחלון slot - רק המנהיג, ורק פעם אחת"""
+        if not self.is_leader:
+            return False
+        try:
+            return await asyncio.to_thread(self.store.claim_job_run, job, slot)
+        except sqlite3.Error as e:
+            logger.error("❌ Error claiming job %s: %s", job, e, extra={'job': job})
+            return False
+
+    async def release(self):
+        """שחרור ההנהגה בכיבוי מסודר"""
+        if self.is_leader:
+            self.is_leader = False
+            await asyncio.to_thread(self.store.release_lease, self.LEADER_LEASE)
+
+    def shard_for(self, update):
+        """שיוך update ל-worker לפי chat - כך מצב ה-ConversationHandler נשאר באותו תהליך"""
+        if update.effective_chat:
+            key = update.effective_chat.id
+        elif update.effective_user:
+            key = update.effective_user.id
+        else:
+            key = update.update_id
+        return key % self.worker_count
+
+    async def poll_updates(self, bot):
+        """המנהיג בלבד מושך updates מטלגרם ומפזר אותם לתור המשותף"""
+        while True:
+            if not self.is_leader:
+                await asyncio.sleep(1)
+                continue
+            try:
+                offset = await asyncio.to_thread(self.store.get_value, 'update_offset')
+                updates = await bot.get_updates(
+                    offset=int(offset) if offset else None,
+                    timeout=UPDATE_POLL_TIMEOUT,
+                    allowed_updates=Update.ALL_TYPES
+                )
+                if updates:
+                    rows = [(u.update_id, self.shard_for(u), u.to_json()) for u in updates]
+                    # ה-lease נבדק שוב בתוך הטרנזקציה - מנהיג שאיבד אותו באמצע ה-long poll לא כותב
+                    enqueued = await asyncio.to_thread(
+                        self.store.enqueue_updates, rows, updates[-1].update_id + 1, self.LEADER_LEASE
+                    )
+                    if not enqueued:
+                        logger.warning("⚠️ Leader lease lost during poll - dropped %s updates for the new leader", len(rows))
+                        self.is_leader = False
+            except (TelegramError, sqlite3.Error) as e:
+                logger.error("❌ Error polling updates: %s", e)
+                await asyncio.sleep(5)
+            except Exception as e:
+                # המשימה חייבת לשרוד - אחרת המנהיג ממשיך לחדש את ה-lease ואף אחד לא מושך updates
+                logger.error("❌ Unexpected error polling updates: %s", e)
+                await asyncio.sleep(5)
+
+    async def consume_updates(self, application):
+        """כל worker מעבד רק את ה-shard שלו מהתור המשותף - at-least-once: מחיקה רק אחרי הטיפול"""
+        while True:
+            try:
+                rows = await asyncio.to_thread(self.store.peek_updates, self.worker_index)
+                for update_id, payload in rows:
+                    await application.process_update(Update.de_json(json.loads(payload), application.bot))
+                    await asyncio.to_thread(self.store.ack_update, update_id)
+            except sqlite3.Error as e:
+                logger.error("❌ Error reading update queue: %s", e)
+                rows = []
+            if not rows:
+                await asyncio.sleep(UPDATE_FETCH_INTERVAL)
+
+class CompiledTemplate:
+    """תבנית שקומפלה פעם אחת ל-f-string (bytecode) - רינדור בלי parse מחדש"""
+
+    def __init__(self, text, name=''):
+        self.name = name
+        self.fields = []
+        body = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            body.append(literal.replace('{', '{{').replace('}', '}}'))
+            if field is None:
+                continue
+            if not field.isidentifier() or '{' in (spec or ''):
+                raise ValueError(f"Unsupported template field in {name}: {{{field}}}")
+            if field not in self.fields:
+                self.fields.append(field)
+            body.append('{_v[%d]%s%s}' % (
+                self.fields.index(field),
+                f"!{conversion}" if conversion else '',
+                f":{spec}" if spec else ''
+            ))
+        self.render_values = eval(compile(f"lambda _v: f{''.join(body)!r}", f"<template {name}>", 'eval'))
+
+    def render(self, context):
+        """רינדור עם מילון ערכים"""
+        return self.render_values([context[field] for field in self.fields])
+
+class TemplateStore:
+    """טעינת תבניות מקבצים פעם אחת, קומפילציה מראש, וריאנטים A/B לפי מנוי וטעינה מחדש כשקובץ משתנה"""
+
+    def __init__(self, directory, default_language=DEFAULT_LANGUAGE):
+        self.directory = directory
+        self.default_language = default_language
+        self.templates = {}
+        self.mtimes = {}
+        self.checked_at = 0
+        self.reload()
+
+    @property
+    def languages(self):
+        """השפות שיש להן תבניות"""
+        return {language for language, _ in self.templates}
+
+    def scan(self):
+        """מיפוי קובץ -> זמן שינוי לכל קבצי התבניות"""
+        mtimes = {}
+        for language in os.listdir(self.directory):
+            language_dir = os.path.join(self.directory, language)
+            if not os.path.isdir(language_dir):
+                continue
+            for entry in os.scandir(language_dir):
+                if entry.name.endswith('.txt'):
+                    mtimes[entry.path] = entry.stat().st_mtime
+        return mtimes
+
+    def reload(self):
+        """טעינה וקומפילציה של כל התבניות; תבנית שבורה משאירה את הגרסה הקודמת"""
+        mtimes = self.scan()
+        templates = {}
+        broken = set()
+        for path in sorted(mtimes):
+            language = os.path.basename(os.path.dirname(path))
+            name, _, variant = os.path.basename(path)[:-len('.txt')].partition('.')
+            try:
+                with open(path, encoding='utf-8') as f:
+                    compiled = CompiledTemplate(f.read().rstrip('\n'), f"{language}/{name}")
+            except (OSError, ValueError, SyntaxError) as e:
+                logger.error("❌ Error compiling template %s: %s", path, e)
+                broken.add((language, name))
+                continue
+            templates.setdefault((language, name), {})[variant or 'a'] = compiled
+        compiled_templates = {key: [variants[v] for v in sorted(variants)] for key, variants in templates.items()}
+        for key in broken:
+            if key in self.templates:
+                compiled_templates[key] = self.templates[key]
+        self.templates = compiled_templates
+        self.mtimes = mtimes
+        self.checked_at = time.monotonic()
+        logger.info("✅ Templates loaded: %s", len(self.templates))
+
+    def maybe_reload(self):
+        """בדיקת שינויים בקבצים לכל היותר פעם ב-TEMPLATE_RELOAD_SECONDS (hot reload בלי restart)"""
+        if time.monotonic() - self.checked_at < TEMPLATE_RELOAD_SECONDS:
+            return
+        self.checked_at = time.monotonic()
+        try:
+            if self.scan() != self.mtimes:
+                self.reload()
+        except Exception as e:
+            # בדיקת ה-hot reload רצה בתוך render - תקלה בה לא מפילה כיתוב או הודעה למנוי
+            logger.error("❌ Error reloading templates: %s", e)
+
+    def variants(self, name, language=None):
+        """כל הווריאנטים של תבנית בשפה, עם נפילה לשפת ברירת המחדל"""
+        self.maybe_reload()
+        variants = self.templates.get((language or self.default_language, name))
+        if variants is None:
+            variants = self.templates[(self.default_language, name)]
+        return variants
+
+    @staticmethod
+    def variant_index(name, user_id, count):
+        """שיוך יציב של מנוי לווריאנט A/B"""
+        if count == 1 or user_id is None:
+            return 0
+        return zlib.crc32(f"{name}:{user_id}".encode()) % count
+
+    def render(self, name, language=None, user_id=None, **context):
+        """רינדור תבנית אחת"""
+        variants = self.variants(name, language)
+        return variants[self.variant_index(name, user_id, len(variants))].render(context)
+
+    def render_batch(self, name, recipients, **context):
+        """רינדור לכמה נמענים (user_id, language): פעם אחת לכל שפה+וריאנט, לא פעם לכל נמען"""
+        rendered = {}
+        result = {}
+        for user_id, language in recipients:
+            variants = self.variants(name, language)
+            key = (id(variants), self.variant_index(name, user_id, len(variants)))
+            if key not in rendered:
+                rendered[key] = variants[key[1]].render(context)
+            result[user_id] = rendered[key]
+        return result
+
+def payment_link_for(user_id):
+    """קישור תשלום - אישי עם telegram_user_id בשדה custom אם מוגדר PAYPAL_BUSINESS_EMAIL"""
+    if not PAYPAL_BUSINESS_EMAIL:
+        return PAYPAL_PAYMENT_LINK
+    params = {
+        'cmd': '_xclick',
+        'business': PAYPAL_BUSINESS_EMAIL,
+        'item_name': 'PeakTrade VIP',
+        'amount': MONTHLY_PRICE,
+        'currency_code': PAYMENT_CURRENCY,
+        'custom': user_id
+    }
+    if PAYPAL_IPN_NOTIFY_URL:
+        params['notify_url'] = PAYPAL_IPN_NOTIFY_URL
+    return "https://www.paypal.com/cgi-bin/webscr?" + urlencode(params)
+
+class PaymentServer:
+    """שרת HTTP מינימלי על asyncio שמקבל IPN ו-webhooks מ-PayPal"""
+
+    REASONS = {
+        200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+        500: 'Internal Server Error', 503: 'Service Unavailable'
+    }
+
+    def __init__(self, pipeline, port):
+        self.pipeline = pipeline
+        self.port = int(port)
+        self.server = None
+        self.routes = {'/paypal/webhook': pipeline.handle_webhook}
+        # IPN רק עם מקבל מוגדר - אחרת IPN מאומת של כל חשבון PayPal אחר היה מפעיל מנוי
+        if PAYPAL_BUSINESS_EMAIL:
+            self.routes['/paypal/ipn'] = pipeline.handle_ipn
+        else:
+            logger.warning("⚠️ PAYPAL_BUSINESS_EMAIL not set - PayPal IPN route disabled")
+
+    async def start(self):
+        """פתיחת השרת"""
+        self.server = await asyncio.start_server(self.handle_connection, host='0.0.0.0', port=self.port)
+        logger.info("✅ Payment server listening on port %s", self.port)
+
+    async def stop(self):
+        """סגירת השרת"""
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle_connection(self, reader, writer):
+        """קריאת בקשה אחת, העברה ל-pipeline ותשובה אחרי שהתשלום אומת ונשמר"""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 10)
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 10)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length') or 0)
+            if length > PAYMENT_MAX_BODY:
+                raise ValueError("body too large")
+            body = await asyncio.wait_for(reader.readexactly(length), 10) if length else b''
+            status = await self.dispatch(method, target.split('?')[0], headers, body)
+        except (ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            status = 400
+        try:
+            writer.write(f"HTTP/1.1 {status} {self.REASONS[status]}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, headers, body):
+        """ניתוב - 200 רק אחרי אימות ושמירה ב-store, 5xx כדי ש-PayPal ישלח שוב"""
+        if path == '/health':
+            return 200
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404
+        if method != 'POST':
+            return 405
+        return await handler(headers, body)
+
+class PaymentPipeline:
+    """אימות תשלומי PayPal, התאמה ל-telegram_user_id ועדכון מנויים ב-batch"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.pending = asyncio.Queue()
+        self.tasks = set()
+
+    def spawn(self, coro):
+        """הרצת coroutine ברקע עם שמירת reference"""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def verify_ipn(self, body):
+        """postback ל-PayPal - IPN תקין רק אם התשובה VERIFIED (חוסם, רץ ב-thread)"""
+        response = requests.post(
+            PAYPAL_IPN_VERIFY_URL,
+            data=b'cmd=_notify-validate&' + body,
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            timeout=15
+        )
+        return response.text.strip() == 'VERIFIED'
+
+    def verify_webhook(self, headers, event):
+        """אימות חתימת webhook דרך PayPal REST API (חוסם, רץ ב-thread)"""
+        if not (PAYPAL_WEBHOOK_ID and PAYPAL_CLIENT_ID and PAYPAL_CLIENT_SECRET):
+            logger.warning("⚠️ PayPal webhook received but webhook verification is not configured")
+            return False
+        token_response = requests.post(
+            f"{PAYPAL_API_BASE}/v1/oauth2/token",
+            data={'grant_type': 'client_credentials'},
+            auth=(PAYPAL_CLIENT_ID, PAYPAL_CLIENT_SECRET),
+            timeout=15
+        )
+        access_token = token_response.json().get('access_token')
+        verify_response = requests.post(
+            f"{PAYPAL_API_BASE}/v1/notifications/verify-webhook-signature",
+            json={
+                'auth_algo': headers.get('paypal-auth-algo'),
+                'cert_url': headers.get('paypal-cert-url'),
+                'transmission_id': headers.get('paypal-transmission-id'),
+                'transmission_sig': headers.get('paypal-transmission-sig'),
+                'transmission_time': headers.get('paypal-transmission-time'),
+                'webhook_id': PAYPAL_WEBHOOK_ID,
+                'webhook_event': event
+            },
+            headers={'Authorization': f"Bearer {access_token}"},
+            timeout=15
+        )
+        return verify_response.json().get('verification_status') == 'SUCCESS'
+
+    async def enqueue(self, payment):
+        """שמירה ב-payment_inbox ואז לתור בזיכרון - מה שלא נכתב לגיליון משוחזר בהפעלה הבאה"""
+        await asyncio.to_thread(self.bot.cluster.store.save_pending_payment, payment)
+        await self.pending.put(payment)
+
+    async def restore_pending(self):
+        """החזרת תשלומים שנשמרו ולא טופלו (קריסה או כשל גיליון) לתור"""
+        try:
+            payments = await asyncio.to_thread(self.bot.cluster.store.pending_payments)
+        except sqlite3.Error as e:
+            logger.error("❌ Error loading pending payments: %s", e)
+            return
+        for payment in payments:
+            await self.pending.put(payment)
+        if payments:
+            logger.info("✅ Restored %s pending payments", len(payments), extra={'job': 'payments'})
+
+    def accept_payment(self, payment):
+        """תשלום מפעיל מנוי רק בסכום המלא ובמטבע הנכון (את הסכום בקישור _xclick אפשר לערוך)"""
+        try:
+            amount = Decimal(str(payment['amount']))
+        except (InvalidOperation, ValueError):
+            amount = None
+        if amount is None or amount < Decimal(MONTHLY_PRICE) or payment['currency'] != PAYMENT_CURRENCY:
+            logger.warning(
+                "⚠️ PayPal payment %s rejected: %s %s (expected %s %s)",
+                payment['txn_id'], payment['amount'], payment['currency'], MONTHLY_PRICE, PAYMENT_CURRENCY,
+                extra={'user_id': payment['user_id']}
+            )
+            return False
+        return True
+
+    async def handle_ipn(self, headers, body):
+        """טיפול ב-IPN: אימות, סינון תשלומים שהושלמו ושמירה - מחזיר את סטטוס ה-HTTP"""
+        try:
+            verified = await asyncio.to_thread(self.verify_ipn, body)
+        except Exception as e:
+            logger.error("❌ PayPal IPN verification unavailable: %s", e)
+            return 503
+        try:
+            if not verified:
+                logger.warning("⚠️ PayPal IPN failed verification")
+                return 200
+            raw = body.decode('ascii', errors='replace')
+            params = dict(parse_qsl(raw))
+            charset = params.get('charset') or 'utf-8'
+            if charset.lower() != 'utf-8':
+                params = dict(parse_qsl(raw, encoding=charset, errors='replace'))
+            if params.get('payment_status') != 'Completed':
+                logger.info("PayPal IPN ignored: status %s", params.get('payment_status'))
+                return 200
+            if not PAYPAL_BUSINESS_EMAIL or params.get('receiver_email', '').lower() != PAYPAL_BUSINESS_EMAIL.lower():
+                logger.warning("⚠️ PayPal IPN for another receiver: %s", params.get('receiver_email'))
+                return 200
+            payment = {
+                'txn_id': params.get('txn_id'),
+                'user_id': params.get('custom'),
+                'email': params.get('payer_email'),
+                'amount': params.get('mc_gross'),
+                'currency': params.get('mc_currency'),
+                'source': 'ipn'
+            }
+            if self.accept_payment(payment):
+                await self.enqueue(payment)
+            return 200
+        except Exception as e:
+            logger.error("❌ Error handling PayPal IPN: %s", e)
+            return 500
+
+    async def handle_webhook(self, headers, body):
+        """טיפול ב-webhook של PayPal REST (PAYMENT.CAPTURE.COMPLETED / PAYMENT.SALE.COMPLETED) - מחזיר את סטטוס ה-HTTP"""
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(event, dict):
+            return 400
+        if event.get('event_type') not in ('PAYMENT.CAPTURE.COMPLETED', 'PAYMENT.SALE.COMPLETED'):
+            return 200
+        try:
+            verified = await asyncio.to_thread(self.verify_webhook, headers, event)
+        except Exception as e:
+            logger.error("❌ PayPal webhook verification unavailable: %s", e)
+            return 503
+        try:
+            if not verified:
+                logger.warning("⚠️ PayPal webhook failed verification")
+                return 200
+            resource = event.get('resource', {})
+            amount = resource.get('amount', {})
+            payment = {
+                'txn_id': resource.get('id'),
+                'user_id': resource.get('custom_id') or resource.get('custom'),
+                'email': resource.get('payer', {}).get('email_address'),
+                'amount': amount.get('value') or amount.get('total'),
+                'currency': amount.get('currency_code') or amount.get('currency'),
+                'source': 'webhook'
+            }
+            if self.accept_payment(payment):
+                await self.enqueue(payment)
+            return 200
+        except Exception as e:
+            logger.error("❌ Error handling PayPal webhook: %s", e)
+            return 500
+
+    async def run_batcher(self):
+        """איסוף תשלומים לחלון קצר ועיבוד כ-batch אחד; מה שלא נכתב לגיליון חוזר לתור"""
+        await self.restore_pending()
+        while True:
+            batch = [await self.pending.get()]
+            await asyncio.sleep(PAYMENT_BATCH_INTERVAL)
+            while not self.pending.empty():
+                batch.append(self.pending.get_nowait())
+            try:
+                failed = await self.apply_batch(batch)
+            except Exception as e:
+                logger.error("❌ Error applying payment batch: %s", e)
+                failed = batch
+            if failed:
+                logger.error("❌ %s payments not applied - retrying in %ss", len(failed), PAYMENT_RETRY_SECONDS, extra={'job': 'payments'})
+                self.spawn(self.requeue(failed))
+
+    async def requeue(self, payments):
+        await asyncio.sleep(PAYMENT_RETRY_SECONDS)
+        for payment in payments:
+            await self.pending.put(payment)
+
+    async def apply_batch(self, batch):
+        """קריאה אחת של הגיליון, עדכון אחד ב-batch_update, ואז unban והודעת אישור לכל משלם.
+        עסקה נרשמת כמטופלת רק אחרי שהגיליון עודכן - מחזיר את התשלומים שצריך לנסות שוב"""
+        store = self.bot.cluster.store
+        payments = {}
+        for payment in batch:
+            if payment['txn_id'] and payment['txn_id'] not in payments:
+                payments[payment['txn_id']] = payment
+        known = await asyncio.to_thread(store.known_payments, list(payments))
+        payments = [payment for txn_id, payment in payments.items() if txn_id not in known]
+        if not payments:
+            return []
+
+        started = time.perf_counter()
+        await self.bot.wait_for_sheets()
+        if not self.bot.sheet:
+            # בלי גיליון לא מפעילים - הסטטוס בגיליון היה נשאר trial_active וה-resync היה מוציא את המשלם
+            logger.error("❌ Google Sheets unavailable - payments %s postponed", [p['txn_id'] for p in payments])
+            return payments
+
+        records = await asyncio.to_thread(self.bot.sheet.get_all_records)
+        rows_by_user = {}
+        rows_by_email = {}
+        for i, record in enumerate(records):
+            rows_by_user[str(record.get('telegram_user_id'))] = (i + 2, record)
+            if record.get('email'):
+                rows_by_email[str(record.get('email')).lower()] = (i + 2, record)
+
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        updates = []
+        matched = []
+        for payment in payments:
+            match = rows_by_user.get(str(payment['user_id'])) or rows_by_email.get(str(payment['email'] or '').lower())
+            if not match:
+                # אין שורה להתאים אליה - נרשם כדי לא לחזור שוב ושוב, לטיפול ידני
+                logger.warning("⚠️ Unmatched PayPal payment %s from %s", payment['txn_id'], payment['email'])
+                await asyncio.to_thread(store.record_payment, payment['txn_id'], '', payment['amount'])
+                continue
+            row_index, record = match
+            updates.append({'range': f"H{row_index}", 'values': [['paid_subscriber']]})
+            updates.append({'range': f"K{row_index}", 'values': [[current_time]]})
+            matched.append((payment, record.get('telegram_user_id'), record.get('payment_status')))
+
+        if updates:
+            await asyncio.to_thread(self.bot.sheet.batch_update, updates)
+        logger.info("✅ Payment batch applied: %s matched of %s", len(matched), len(payments), extra={
+            'job': 'payments',
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+        })
+
+        for payment, user_id, previous_status in matched:
+            if await asyncio.to_thread(store.record_payment, payment['txn_id'], user_id, payment['amount']):
+                await self.bot.activate_paid_subscriber(user_id, renewal=previous_status == 'paid_subscriber')
+        return []
+
+class LifecycleEngine:
+    """מנוע מחזור חיי מנוי: min-heap של אירועים (תזכורת, הודעה סופית, הסרה, חידוש) שנורים בזמן המדויק"""
+
+    # (שלב, זמן יחסית לסיום הניסיון)
+    TRIAL_STAGES = (
+        ('reminder', timedelta(days=-1)),
+        ('final_notice', timedelta(days=1)),
+        ('ban', timedelta(days=2))
+    )
+    # (שלב, זמן יחסית לסוף החודש ששולם) - מי שלא חידש יוצא כמו בסוף הניסיון
+    RENEWAL_STAGES = (
+        ('renewal', timedelta(days=-1)),
+        ('renewal_final', timedelta(days=1)),
+        ('expire', timedelta(days=2))
+    )
+    RENEWAL_DUE_STAGES = {stage for stage, _ in RENEWAL_STAGES}
+    # פער בין זמן רישום התשלום לזמן התזמון שלו - תשלום מאוחר יותר מזה הוא חידוש
+    PAYMENT_SLACK = timedelta(minutes=5)
+    EXPECTED_STATUS = {
+        'reminder': 'trial_active',
+        'final_notice': 'trial_active',
+        'ban': 'trial_active',
+        'renewal': 'paid_subscriber',
+        'renewal_final': 'paid_subscriber',
+        'expire': 'paid_subscriber'
+    }
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.heap = []
+        self.versions = {}
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.rows = {}  # telegram_user_id -> מספר שורה בגיליון, כדי לקרוא רק את השורות של אירועים שהגיעו
+        self.resync_seen = None
+
+    def push(self, due, user_id, stage):
+        """הכנסת אירוע ל-heap והערת הלולאה אם הוא המוקדם ביותר"""
+        key = str(user_id)
+        entry = (due, next(self.counter), key, self.versions.get(key, 0), stage)
+        heapq.heappush(self.heap, entry)
+        if self.heap[0] is entry:
+            self.wakeup.set()
+
+    def cancel(self, user_id):
+        """ביטול כל האירועים הממתינים של משתמש (ה-entries הישנים מדולגים בשליפה)"""
+        key = str(user_id)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def schedule_stages(self, user_id, end, stages, now=None):
+        """תזמון רצף שלבים יחסית לתאריך סיום - שלב שכבר עבר מדולג אם גם השלב שאחריו כבר הגיע"""
+        now = now or datetime.now()
+        self.cancel(user_id)
+        dues = [(stage, end + offset) for stage, offset in stages]
+        for i, (stage, due) in enumerate(dues):
+            if i + 1 < len(dues) and dues[i + 1][1] <= now:
+                continue
+            self.push(due, user_id, stage)
+
+    def schedule_trial(self, user_id, trial_end, now=None):
+        """תזמון שלבי הניסיון: תזכורת, הודעה סופית והסרה"""
+        self.schedule_stages(user_id, trial_end, self.TRIAL_STAGES, now)
+
+    def schedule_renewal(self, user_id, paid_at, now=None):
+        """תזמון שלבי החידוש למנוי משלם (מבטל את שלבי הניסיון): תזכורת, הודעה סופית והסרה"""
+        self.schedule_stages(user_id, paid_at + timedelta(days=SUBSCRIPTION_DAYS), self.RENEWAL_STAGES, now)
+
+    def rebuild(self, records, last_payments):
+        """בניית ה-heap מחדש מהגיליון - בלי לשלוח כלום, רק תזמון"""
+        self.heap = []
+        self.versions = {}
+        self.rows = {}
+        now = datetime.now()
+        for i, record in enumerate(records):
+            user_id = record.get('telegram_user_id')
+            self.rows[str(user_id)] = i + 2
+            status = record.get('payment_status')
+            if status == 'trial_active' and record.get('trial_end_date'):
+                try:
+                    trial_end = datetime.strptime(record.get('trial_end_date'), "%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    logger.error("Invalid date format: %s", record.get('trial_end_date'))
+                    continue
+                self.schedule_trial(user_id, trial_end, now)
+            elif status == 'paid_subscriber' and str(user_id) in last_payments:
+                self.schedule_renewal(user_id, datetime.fromtimestamp(last_payments[str(user_id)]), now)
+        self.wakeup.set()
+
+    def pop_due(self, now):
+        """שליפת כל האירועים שהגיע זמנם ועדיין בתוקף"""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            if entry[3] == self.versions.get(entry[2], 0):
+                due.append(entry)
+        return due
+
+    def set_row(self, user_id, row_index):
+        """עדכון המפה כשנוספת שורה (רישום חדש) - בלי לקרוא את הגיליון מחדש"""
+        self.rows[str(user_id)] = row_index
+
+    async def due_statuses(self, user_ids):
+        """סטטוס עדכני רק לשורות של המשתמשים שהאירועים שלהם הגיעו - batch_get אחד של טווחים קטנים"""
+        sheet = self.bot.sheet
+        if not sheet:
+            return {}
+        known = [user_id for user_id in user_ids if user_id in self.rows]
+        ranges = [f"A{self.rows[user_id]}:H{self.rows[user_id]}" for user_id in known]
+        values = await asyncio.to_thread(sheet.batch_get, ranges) if ranges else []
+        result = {}
+        for user_id, rows in zip(known, values):
+            row = rows[0] if rows else []
+            if row and str(row[0]) == user_id:
+                result[user_id] = (self.rows[user_id], row[7] if len(row) > 7 else '')
+        missing = [user_id for user_id in user_ids if user_id not in result]
+        if missing:
+            # שורה שזזה (מחיקה ידנית) או שלא מוכרת - קריאה אחת של שתי העמודות ורענון המפה
+            statuses = await self.bot.fetch_user_statuses()
+            self.rows = {user_id: row_index for user_id, (row_index, _) in statuses.items()}
+            result.update({user_id: statuses[user_id] for user_id in missing if user_id in statuses})
+        return result
+
+    async def resync_requested(self):
+        """האם מנהל ביקש /resync מאז הבדיקה הקודמת (מכל worker, דרך ה-store המשותף)"""
+        requested = await asyncio.to_thread(self.bot.cluster.store.get_value, 'lifecycle_resync_at')
+        if requested == self.resync_seen:
+            return False
+        first_check = self.resync_seen is None
+        self.resync_seen = requested
+        return not first_check
+
+    def renewed_since(self, user_id, due, stage, last_payments):
+        """זמן תשלום חדש יותר מזה שממנו תוזמן שלב החידוש (חידוש שנקלט ב-worker אחר), או None"""
+        if str(user_id) not in last_payments:
+            return None
+        paid_at = datetime.fromtimestamp(last_payments[str(user_id)])
+        period_end = due - dict(self.RENEWAL_STAGES)[stage]
+        if paid_at + timedelta(days=SUBSCRIPTION_DAYS) > period_end + self.PAYMENT_SLACK:
+            return paid_at
+        return None
+
+    async def fire_due(self, events):
+        """ירי batch של אירועים: אימות סטטוס רק לשורות של המשתמשים האלה, תפיסה ב-cluster והפעלה"""
+        statuses = await self.due_statuses({user_id for _, _, user_id, _, _ in events})
+        last_payments = {}
+        if any(stage in self.RENEWAL_DUE_STAGES for _, _, _, _, stage in events):
+            last_payments = await asyncio.to_thread(self.bot.cluster.store.last_payments)
+        for due, _, user_id, _, stage in events:
+            row_index, status = statuses.get(user_id, (None, None))
+            if status != self.EXPECTED_STATUS[stage]:
+                continue
+            if stage in self.RENEWAL_DUE_STAGES:
+                paid_at = self.renewed_since(user_id, due, stage, last_payments)
+                if paid_at:
+                    # ה-heap של המנהיג לא ראה את החידוש - תזמון מחדש מהתשלום האחרון במקום ירי
+                    logger.info("⏭️ Skipping stale %s for %s - renewed at %s", stage, user_id, paid_at, extra={'user_id': user_id})
+                    self.schedule_renewal(user_id, paid_at)
+                    continue
+            if not await self.bot.cluster.claim(f"lifecycle_{stage}", f"{user_id}:{due.isoformat()}"):
+                continue
+            if stage == 'reminder':
+                await self.bot.send_trial_expiry_reminder(user_id)
+            elif stage == 'final_notice':
+                await self.bot.send_final_payment_message(user_id)
+            elif stage == 'ban':
+                await self.bot.remove_from_channel(user_id, row_index, 'trial_removed', 'expired_no_payment')
+            elif stage == 'renewal':
+                await self.bot.send_renewal_reminder(user_id)
+            elif stage == 'renewal_final':
+                await self.bot.send_renewal_final_message(user_id)
+            elif stage == 'expire':
+                await self.bot.remove_from_channel(user_id, row_index, 'subscription_expired', 'expired_no_renewal')
+
+    async def run(self):
+        """לולאת המנוע - ישנה עד האירוע הבא; רק המנהיג יורה, ומנהיג חדש בונה את ה-heap מחדש"""
+        was_leader = False
+        rebuild_pending = False
+        retry_delay = LIFECYCLE_RETRY_SECONDS
+        retry_at = 0
+        while True:
+            is_leader = self.bot.cluster.is_leader
+            try:
+                resync = await self.resync_requested()
+            except sqlite3.Error as e:
+                logger.error("❌ Error reading resync request: %s", e)
+                resync = False
+            if is_leader and (resync or not was_leader):
+                rebuild_pending = True
+                retry_at = 0
+            # מי שאיבד את ההנהגה לא בונה - המנהיג החדש יבנה בעצמו
+            rebuild_pending = rebuild_pending and is_leader
+            was_leader = is_leader
+            if rebuild_pending and time.monotonic() >= retry_at:
+                if await self.bot.check_trial_expiry():
+                    rebuild_pending = False
+                    retry_delay = LIFECYCLE_RETRY_SECONDS
+                else:
+                    logger.warning("⚠️ Lifecycle rebuild failed - retrying in %ss", retry_delay, extra={'job': 'lifecycle'})
+                    retry_at = time.monotonic() + retry_delay
+                    retry_delay = min(retry_delay * 2, LIFECYCLE_MAX_SLEEP)
+
+            now = datetime.now()
+            if is_leader:
+                events = self.pop_due(now)
+                if events:
+                    started = time.perf_counter()
+                    try:
+                        await self.fire_due(events)
+                    except Exception as e:
+                        logger.error("❌ Error firing lifecycle events: %s", e)
+                    logger.info("✅ Lifecycle events fired: %s", len(events), extra={
+                        'job': 'lifecycle',
+                        'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+                    })
+                    continue
+
+            timeout = LIFECYCLE_MAX_SLEEP
+            if is_leader and self.heap:
+                timeout = min(timeout, max(0, (self.heap[0][0] - now).total_seconds()))
+            elif not is_leader:
+                timeout = min(timeout, self.bot.cluster.lease_seconds / 3)
+            if rebuild_pending:
+                timeout = min(timeout, max(0, retry_at - time.monotonic()))
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+class ChannelReconciler:
+    """התאמה בין חברות בפועל בערוץ לבין מאגר המנויים בעזרת diff של קבוצות"""
+
+    # סטטוסים של טלגרם שנחשבים "בתוך הערוץ"
+    PRESENT_STATUSES = ('member', 'administrator', 'creator', 'restricted')
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @classmethod
+    def normalize_status(cls, chat_member):
+        """מיפוי סטטוס ChatMember ל-member / left / kicked"""
+        if chat_member.status in cls.PRESENT_STATUSES:
+            return 'member'
+        if chat_member.status == 'kicked':
+            return 'kicked'
+        return 'left'
+
+    def compute_drift(self, statuses, members, banned, admins):
+        """diff בין מי שזכאי לבין מי שבפועל בערוץ - הכול פעולות על sets בזיכרון"""
+        entitled = set()
+        for user_id, (_, status) in statuses.items():
+            if status in ACTIVE_STATUSES and user_id.lstrip('-').isdigit():
+                entitled.add(int(user_id))
+        return {
+            'intruders': members - entitled - admins,
+            'wrongly_banned': banned & entitled,
+            'not_joined': entitled - members - banned
+        }
+
+    async def call_with_retry(self, action, user_id):
+        """קריאה ל-API עם המתנה אחת על RetryAfter"""
+        try:
+            await action(user_id)
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await action(user_id)
+
+    async def apply_in_batches(self, user_ids, action, new_status):
+        """הפעלת action ב-batches עם הגבלת קצב, ורישום הסטטוס החדש במאגר"""
+        user_ids = sorted(user_ids)
+        done = []
+        for start in range(0, len(user_ids), RECONCILE_BATCH_SIZE):
+            batch = user_ids[start:start + RECONCILE_BATCH_SIZE]
+            results = await asyncio.gather(
+                *(self.call_with_retry(action, user_id) for user_id in batch),
+                return_exceptions=True
+            )
+            for user_id, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    logger.error("❌ Reconcile action failed for user %s: %s", user_id, result, extra={'user_id': user_id})
+                else:
+                    done.append((user_id, new_status))
+            await asyncio.sleep(len(batch) / RECONCILE_RATE_PER_SECOND)
+        if done:
+            await asyncio.to_thread(self.bot.cluster.store.set_member_statuses, done)
+        return len(done)
+
+    async def ban(self, user_id):
+        """חסימת משתמש שנכנס בלי מנוי (למשל דרך קישור שדלף)"""
+        await self.bot.application.bot.ban_chat_member(chat_id=CHANNEL_ID, user_id=user_id)
+
+    async def unban(self, user_id):
+        """שחרור חסימה של מנוי פעיל וקישור חדש לערוץ"""
+        bot = self.bot.application.bot
+        await bot.unban_chat_member(chat_id=CHANNEL_ID, user_id=user_id, only_if_banned=True)
+        invite_link = await bot.create_chat_invite_link(
+            chat_id=CHANNEL_ID,
+            member_limit=1,
+            expire_date=int((datetime.now() + timedelta(days=2)).timestamp()),
+            name=f"Restore_{user_id}"
+        )
+        try:
+            await bot.send_message(
+                chat_id=user_id,
+                text=await self.bot.render_for_user('access_restored', user_id, invite_link=invite_link.invite_link),
+                disable_web_page_preview=True
+            )
+        except TelegramError:
+            pass
+
+    async def reconcile(self):
+        """בניית diff, דיווח על הסטייה ותיקון (אם RECONCILE_APPLY)"""
+        started = time.perf_counter()
+        statuses = await self.bot.fetch_user_statuses()
+        if not statuses:
+            logger.warning("⚠️ Channel reconcile skipped - subscriber store unavailable")
+            return None
+        members, banned = await asyncio.to_thread(self.bot.cluster.store.member_snapshot)
+        administrators = await self.bot.application.bot.get_chat_administrators(CHANNEL_ID)
+        admins = {member.user.id for member in administrators}
+
+        drift = self.compute_drift(statuses, members, banned, admins)
+        logger.info(
+            "📋 Channel drift: %s members tracked, %s intruders, %s wrongly banned, %s entitled not joined",
+            len(members), len(drift['intruders']), len(drift['wrongly_banned']), len(drift['not_joined']),
+            extra={'job': 'channel_reconcile'}
+        )
+
+        if RECONCILE_APPLY:
+            banned_count = await self.apply_in_batches(drift['intruders'], self.ban, 'kicked')
+            unbanned_count = await self.apply_in_batches(drift['wrongly_banned'], self.unban, 'left')
+            logger.info("✅ Channel reconcile applied: %s banned, %s unbanned", banned_count, unbanned_count, extra={
+                'job': 'channel_reconcile',
+                'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+            })
+        return drift
+
+class WatchlistEngine:
+    """התראות DM על סימבולים במעקב: אינדקס הפוך symbol -> משתמשים, איחוד התראות לחלון ותור שליחה מוגבל קצב"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.index = {}
+        self.index_version = None
+        self.pending = {}  # symbol -> הקשר ההתראה האחרונה שלו בחלון הנוכחי
+        self.published = asyncio.Event()
+        self.queue = asyncio.Queue()
+        self.rate_lock = asyncio.Lock()
+        self.next_send = 0
+        self.paused_until = 0
+
+    @staticmethod
+    def normalize_symbol(symbol):
+        """BTC/USD ו-BTC הם אותו סימבול במעקב"""
+        return symbol.strip().upper().removesuffix('/USD')
+
+    @staticmethod
+    def valid_symbol(symbol):
+        return 0 < len(symbol) <= 12 and all(char.isalnum() or char in '.-' for char in symbol)
+
+    def publish(self, symbol, **context):
+        """התראה על סימבול - נאספת לחלון ונשלחת יחד עם שאר ההתראות של אותו חלון"""
+        symbol = self.normalize_symbol(symbol)
+        self.pending[symbol] = dict(context, symbol=symbol)
+        self.published.set()
+
+    async def refresh_index(self):
+        """טעינה מחדש של האינדקס רק אם ה-watchlist השתנה (בכל worker שהוא)"""
+        store = self.bot.cluster.store
+        version = await asyncio.to_thread(store.get_value, 'watchlist_version', '0')
+        if version != self.index_version:
+            self.index_version, self.index = await asyncio.to_thread(store.watchlist_index)
+
+    def recipients_for(self, alerts):
+        """קיבוץ המשתמשים לפי קבוצת הסימבולים שהתריעו עבורם - הודעה אחת לכל משתמש"""
+        by_user = {}
+        for symbol in sorted(alerts):
+            for user_id in self.index.get(symbol, ()):
+                by_user.setdefault(user_id, []).append(symbol)
+        groups = {}
+        for user_id, symbols in by_user.items():
+            groups.setdefault(tuple(symbols), []).append(user_id)
+        return groups
+
+    async def flush(self):
+        """הפיכת ההתראות של החלון להודעות ממוינות לפי שפה, והכנסתן לתור השליחה"""
+        alerts, self.pending = self.pending, {}
+        if not alerts:
+            return 0
+        statuses = await self.bot.fetch_user_statuses()
+        if not statuses:
+            logger.warning("⚠️ Watchlist alerts skipped - subscriber store unavailable")
+            return 0
+        await self.refresh_index()
+
+        groups = self.recipients_for(alerts)
+        entitled = {
+            user_id for user_ids in groups.values() for user_id in user_ids
+            if statuses.get(str(user_id), (None, ''))[1] in ACTIVE_STATUSES
+        }
+        languages = await asyncio.to_thread(self.bot.cluster.store.get_languages, entitled)
+        templates = self.bot.templates
+        queued = 0
+        for symbols, user_ids in groups.items():
+            by_language = {}
+            for user_id in user_ids:
+                if user_id in entitled:
+                    by_language.setdefault(languages.get(str(user_id), DEFAULT_LANGUAGE), []).append(user_id)
+            for language, members in by_language.items():
+                lines = '\n'.join(
+                    templates.render(
+                        'watchlist_alert_line' if 'current_price' in alerts[symbol] else 'watchlist_alert_line_basic',
+                        language, **alerts[symbol]
+                    )
+                    for symbol in symbols
+                )
+                messages = templates.render_batch(
+                    'watchlist_alert', [(user_id, language) for user_id in members],
+                    count=len(symbols), alerts=lines
+                )
+                for user_id, text in messages.items():
+                    self.queue.put_nowait((user_id, text))
+                queued += len(messages)
+        logger.info("📨 Watchlist alerts queued: %s users, %s symbols", queued, len(alerts), extra={'job': 'watchlist'})
+        return queued
+
+    async def throttle(self):
+        """קצב גלובלי של WATCHLIST_RATE_PER_SECOND הודעות, ועצירת כל השולחים אחרי RetryAfter"""
+        async with self.rate_lock:
+            now = time.monotonic()
+            send_at = max(now, self.next_send, self.paused_until)
+            self.next_send = send_at + 1 / WATCHLIST_RATE_PER_SECOND
+        await asyncio.sleep(send_at - now)
+        while time.monotonic() < self.paused_until:
+            await asyncio.sleep(self.paused_until - time.monotonic())
+
+    async def deliver(self, user_id, text):
+        """שליחת הודעה אחת; משתמש שחסם את הבוט יוצא מהמעקב"""
+        for _ in range(3):
+            await self.throttle()
+            try:
+                await self.bot.application.bot.send_message(chat_id=user_id, text=text)
+                return True
+            except RetryAfter as e:
+                self.paused_until = max(self.paused_until, time.monotonic() + e.retry_after)
+                logger.warning("⚠️ Watchlist delivery paused for %ss (flood control)", e.retry_after, extra={'job': 'watchlist'})
+            except Forbidden:
+                await asyncio.to_thread(self.bot.cluster.store.remove_watch, [user_id])
+                logger.info("🚫 User %s blocked the bot - watchlist removed", user_id, extra={'user_id': user_id})
+                return False
+            except TelegramError as e:
+                logger.error("❌ Watchlist delivery failed for user %s: %s", user_id, e, extra={'user_id': user_id})
+                return False
+        return False
+
+    async def sender(self):
+        while True:
+            user_id, text = await self.queue.get()
+            try:
+                await self.deliver(user_id, text)
+            except Exception as e:
+                logger.error("❌ Watchlist sender error for user %s: %s", user_id, e, extra={'user_id': user_id})
+            finally:
+                self.queue.task_done()
+
+    async def run(self):
+        """לולאת החלונות: ההתראה הראשונה פותחת חלון, בסופו כל ההתראות יוצאות יחד"""
+        senders = [asyncio.create_task(self.sender()) for _ in range(WATCHLIST_SENDERS)]
+        try:
+            while True:
+                await self.published.wait()
+                await asyncio.sleep(WATCHLIST_COALESCE_SECONDS)
+                self.published.clear()
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error("❌ Error flushing watchlist alerts: %s", e)
+        finally:
+            for task in senders:
+                task.cancel()
+
 class PeakTradeBot:
-    def __init__(self):
+    def __init__(self, worker_index=0, worker_count=1):
         self.application = None
         self.scheduler = None
         self.google_client = None
         self.sheet = None
         self.twelve_api = TwelveDataAPI(TWELVE_DATA_API_KEY)
-        self.setup_google_sheets()
+        self.sheets_ready = asyncio.Event()
+        self.background_tasks = []
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self.cluster = None
+        self.payments = None
+        self.payment_server = None
+        self.lifecycle = LifecycleEngine(self)
+        self.reconciler = ChannelReconciler(self)
+        self.templates = TemplateStore(TEMPLATES_DIR)
+        self.watchlist = WatchlistEngine(self)
+        self.chart_lock = threading.Lock()
         
     def setup_google_sheets(self):
-        """הגדרת חיבור ל-Google Sheets"""
+        """הגדרת חיבור ל-Google Sheets (חוסם - רץ ב-thread מתוך connect_google_sheets)"""
         try:
             if GOOGLE_CREDENTIALS:
+                gspread, Credentials = load_sheets_client()
                 creds_dict = json.loads(GOOGLE_CREDENTIALS)
                 scope = [
                     'https://spreadsheets.google.com/feeds',
@@ -152,7 +1872,66 @@ class PeakTradeBot:
             else:
                 logger.warning("⚠️ Google Sheets credentials not found")
         except Exception as e:
-            logger.error(f"❌ Error setting up Google Sheets: {e}")
+            logger.error("❌ Error setting up Google Sheets: %s", e)
+
+    async def connect_google_sheets(self):
+        """חיבור אסינכרוני ל-Google Sheets ברקע, בלי לעכב את תחילת ה-polling"""
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.setup_google_sheets)
+        finally:
+            self.sheets_ready.set()
+            logger.info("✅ Google Sheets startup finished", extra={
+                'job': 'sheets_connect',
+                'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+            })
+
+    async def wait_for_sheets(self):
+        """המתנה קצרה לחיבור Sheets עבור פעולות שחייבות לכתוב לגיליון"""
+        try:
+            await asyncio.wait_for(self.sheets_ready.wait(), SHEETS_READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Google Sheets not ready after %ss", SHEETS_READY_TIMEOUT)
+
+    async def warm_up_heavy_modules(self):
+        """טעינת מודולים כבדים ב-thread ברקע אחרי שה-polling כבר רץ"""
+        started = time.perf_counter()
+        for loader in HEAVY_MODULE_LOADERS:
+            try:
+                await asyncio.to_thread(loader)
+            except Exception as e:
+                logger.error("❌ Error warming up %s: %s", loader.__name__, e)
+        logger.info("✅ Heavy modules warmed up", extra={
+            'job': 'warm_up',
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+        })
+
+    async def language_for(self, user_id):
+        """שפת ההודעות של מנוי (ברירת מחדל אם לא נשמרה)"""
+        if not self.cluster:
+            return DEFAULT_LANGUAGE
+        try:
+            languages = await asyncio.to_thread(self.cluster.store.get_languages, [user_id])
+        except sqlite3.Error as e:
+            logger.error("❌ Error reading language for %s: %s", user_id, e, extra={'user_id': user_id})
+            return DEFAULT_LANGUAGE
+        return languages.get(str(user_id), DEFAULT_LANGUAGE)
+
+    async def render_for_user(self, name, user_id, **context):
+        """רינדור תבנית בשפה ובווריאנט של המנוי"""
+        return self.templates.render(name, await self.language_for(user_id), user_id, **context)
+
+    async def fetch_user_statuses(self):
+        """מיפוי telegram_user_id -> (מספר שורה, סטטוס) בקריאה אחת של שתי עמודות"""
+        if not self.sheet:
+            return {}
+        user_ids, statuses = await asyncio.to_thread(self.sheet.batch_get, ['A2:A', 'H2:H'])
+        result = {}
+        for i, row in enumerate(user_ids):
+            if row:
+                status = statuses[i][0] if i < len(statuses) and statuses[i] else ''
+                result[str(row[0])] = (i + 2, status)
+        return result
 
     def check_user_exists(self, user_id):
         """בדיקה אם משתמש כבר קיים ב-Google Sheets"""
@@ -168,17 +1947,50 @@ class PeakTradeBot:
                         return True
             return False
         except Exception as e:
-            logger.error(f"❌ Error checking user existence: {e}")
+            logger.error("❌ Error checking user existence: %s", e)
             return False
 
-    def create_professional_chart_with_prices(self, symbol, data, current_price, entry_price, stop_loss, target1, target2):
-        """יצירת גרף מקצועי עם מחירים ספציפיים מסומנים - טקסט באנגלית"""
+    def create_professional_chart_with_prices(self, symbol, data, current_price, entry_price, stop_loss, target1, target2, backend=CHART_BACKEND, timeframe=SIGNAL_TIMEFRAME):
+        """יצירת גרף מקצועי עם מחירים ספציפיים מסומנים - טקסט באנגלית, לפי CHART_BACKEND (חוסם - להריץ ב-thread)"""
+        if backend == 'pillow':
+            return self.create_pillow_chart(symbol, data, current_price, entry_price, stop_loss, target1, target2)
+        # pyplot שומר state גלובלי - רינדור אחד בכל פעם
+        with self.chart_lock:
+            return self.create_matplotlib_chart(symbol, data, current_price, entry_price, stop_loss, target1, target2, timeframe)
+
+    def create_pillow_chart(self, symbol, data, current_price, entry_price, stop_loss, target1, target2):
+        """גרף קל ב-Pillow - JPEG/PNG בגודל טלגרם"""
+        try:
+            levels = [
+                ('current', f'Current Price: ${current_price:.2f}', current_price, 'yellow', '-', 4),
+                ('entry', f'Entry: ${entry_price:.2f}', entry_price, 'lime', '-', 3),
+                ('stop', f'Stop Loss: ${stop_loss:.2f}', stop_loss, 'red', '--', 3),
+                ('target1', f'Target 1: ${target1:.2f}', target1, 'gold', ':', 3),
+                ('target2', f'Target 2: ${target2:.2f}', target2, 'cyan', ':', 3)
+            ]
+            buffer = PillowChartRenderer().render(
+                symbol,
+                list(data.index),
+                data['Low'].tolist(),
+                data['High'].tolist(),
+                data['Close'].tolist(),
+                levels
+            )
+            logger.info("✅ Professional chart created for %s", symbol, extra={'symbol': symbol})
+            return buffer
+        except Exception as e:
+            logger.error("❌ Error creating chart: %s", e)
+            return None
+
+    def create_matplotlib_chart(self, symbol, data, current_price, entry_price, stop_loss, target1, target2, timeframe=SIGNAL_TIMEFRAME):
+        """גרף matplotlib המקורי (PNG ב-dpi=300)"""
         try:
+            plt = load_pyplot()
             plt.style.use('dark_background')
             fig, ax = plt.subplots(figsize=(14, 10))
             
             ax.plot(data.index, data['Close'], color='white', linewidth=3, label=f'{symbol} Price', alpha=0.9)
-            ax.fill_between(data.index, data['Low'], data['High'], alpha=0.2, color='gray', label='Daily Range')
+            ax.fill_between(data.index, data['Low'], data['High'], alpha=0.2, color='gray', label=f'{TIMEFRAME_LABELS[timeframe]} Range')
             
             ax.axhline(current_price, color='yellow', linestyle='-', linewidth=4, 
                       label=f'💰 Current Price: ${current_price:.2f}', alpha=1.0)
@@ -218,27 +2030,31 @@ class PeakTradeBot:
             buffer.seek(0)
             plt.close()
             
-            logger.info(f"✅ Professional chart created for {symbol}")
+            logger.info("✅ Professional chart created for %s", symbol, extra={'symbol': symbol})
             return buffer
             
         except Exception as e:
-            logger.error(f"❌ Error creating chart: {e}")
+            logger.error("❌ Error creating chart: %s", e)
             return None
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """פקודת התחלה עם disclaimer"""
         user = update.effective_user
-        logger.info(f"User {user.id} ({user.username}) started PeakTrade bot")
+        logger.info("User %s (%s) started PeakTrade bot", user.id, user.username, extra={'user_id': user.id})
         
-        disclaimer_message = f"""היי, זה מצוות הערוץ ״PeakTrade VIP״ 
-
-המנוי שלך מתחיל היום {datetime.now().strftime('%d.%m')} ויסתיים ב{(datetime.now() + timedelta(days=7)).strftime('%d.%m')}
-
-חשוב להבהיר:
-🚫התוכן כאן אינו מהווה ייעוץ או המלצה פיננסית מכל סוג!
-📌 ההחלטות בסופו של דבר בידיים שלכם – איך לפעול, מתי להיכנס ומתי לצאת מהשוק.
-
-אנא אשר שקראת והבנת את כל הפרטים."""
+        language = (user.language_code or '').split('-')[0]
+        if language in self.templates.languages:
+            try:
+                await asyncio.to_thread(self.cluster.store.set_language, user.id, language)
+            except sqlite3.Error as e:
+                logger.error("❌ Error saving language for %s: %s", user.id, e, extra={'user_id': user.id})
+        
+        disclaimer_message = await self.render_for_user(
+            'start_disclaimer', user.id,
+            confirm_word=self.templates.render('confirm_word', await self.language_for(user.id)),
+            start_date=datetime.now().strftime('%d.%m'),
+            end_date=(datetime.now() + timedelta(days=TRIAL_DAYS)).strftime('%d.%m')
+        )
         
         await update.message.reply_text(disclaimer_message)
         return WAITING_FOR_EMAIL
@@ -246,11 +2062,13 @@ class PeakTradeBot:
     async def log_disclaimer_sent(self, user):
         """רישום שליחת disclaimer ב-Google Sheets"""
         try:
+            await self.wait_for_sheets()
             if not self.sheet:
                 return
                 
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            trial_end = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S")
+            registered_at = datetime.now()
+            current_time = registered_at.strftime("%Y-%m-%d %H:%M:%S")
+            trial_end = (registered_at + timedelta(days=TRIAL_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
             
             new_row = [
                 user.id,
@@ -265,25 +2083,33 @@ class PeakTradeBot:
                 "",
                 current_time
             ]
-            self.sheet.append_row(new_row)
-            logger.info(f"✅ User {user.id} registered for trial")
+            response = self.sheet.append_row(new_row)
+            # "Sheet1!A12:K12" -> 12
+            updated_range = (response or {}).get('updates', {}).get('updatedRange', '')
+            row_digits = ''.join(char for char in updated_range.split('!')[-1].split(':')[0] if char.isdigit())
+            if row_digits:
+                self.lifecycle.set_row(user.id, int(row_digits))
+            self.lifecycle.schedule_trial(user.id, datetime.strptime(trial_end, "%Y-%m-%d %H:%M:%S"))
+            logger.info("✅ User %s registered for trial", user.id, extra={'user_id': user.id})
             
         except Exception as e:
-            logger.error(f"❌ Error logging disclaimer: {e}")
+            logger.error("❌ Error logging disclaimer: %s", e)
 
     async def handle_email_confirmation(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """טיפול באישור - רק המילה מאשר"""
+        """טיפול באישור - רק מילת האישור בשפת המשתמש (או בשפת ברירת המחדל)"""
         user = update.effective_user
         message_text = update.message.text.strip()
+        confirm_word = self.templates.render('confirm_word', await self.language_for(user.id))
+        accepted = {confirm_word.lower(), self.templates.render('confirm_word', DEFAULT_LANGUAGE).lower()}
         
-        if message_text.lower() != "מאשר":
+        if message_text.lower() not in accepted:
             await update.message.reply_text(
-                "❌ אנא שלח את המילה: מאשר"
+                await self.render_for_user('confirm_word_required', user.id, confirm_word=confirm_word)
             )
             return WAITING_FOR_EMAIL
         
         processing_msg = await update.message.reply_text(
-            "⏳ מכין עבורך את הקישור לערוץ הפרמיום..."
+            await self.render_for_user('registration_processing', user.id)
         )
         
         try:
@@ -296,64 +2122,42 @@ class PeakTradeBot:
                 name=f"Trial_{user.id}_{user.username or 'user'}"
             )
             
-            success_message = f"""🎉 ברוך הבא ל-PeakTrade VIP!
-
-👤 שם משתמש: @{user.username or 'לא זמין'}
-
-🔗 הקישור שלך לערוץ הפרמיום:
-{invite_link.invite_link}
-
-⏰ תקופת הניסיון שלך: 7 ימים מלאים
-📅 מתחיל היום: {datetime.now().strftime("%d/%m/%Y")}
-📅 מסתיים: {(datetime.now() + timedelta(days=7)).strftime("%d/%m/%Y")}
-
-🎯 מה מחכה לך בערוץ:
-• המלצות מניות חמות כל 30 דקות
-• גרפים מקצועיים עם נקודות כניסה ויציאה
-• ניתוחים טכניים מתקדמים
-• קהילת משקיעים פעילה
-
-לחץ על הקישור והצטרף עכשיו! 🚀
-
-בהצלחה במסחר! 💪"""
+            language = await self.language_for(user.id)
+            success_message = self.templates.render(
+                'trial_welcome', language, user.id,
+                username=user.username or self.templates.render('username_unavailable', language),
+                invite_link=invite_link.invite_link,
+                trial_days=TRIAL_DAYS,
+                start_date=datetime.now().strftime("%d/%m/%Y"),
+                end_date=(datetime.now() + timedelta(days=TRIAL_DAYS)).strftime("%d/%m/%Y")
+            )
             
             await processing_msg.edit_text(
                 success_message,
                 disable_web_page_preview=True
             )
             
-            logger.info(f"✅ Trial registration successful for user {user.id}")
+            logger.info("✅ Trial registration successful for user %s", user.id, extra={'user_id': user.id})
             return ConversationHandler.END
             
         except Exception as e:
-            logger.error(f"❌ Error in trial registration: {e}")
+            logger.error("❌ Error in trial registration: %s", e)
             await processing_msg.edit_text(
-                "❌ אופס! משהו השתבש ברישום\n\nאנא נסה שוב או פנה לתמיכה."
+                await self.render_for_user('registration_error', user.id)
             )
             return ConversationHandler.END
 
     async def send_trial_expiry_reminder(self, user_id):
         """שליחת תזכורת תשלום יום לפני סיום תקופת הניסיון"""
         try:
+            language = await self.language_for(user_id)
             keyboard = [
-                [InlineKeyboardButton("💎 כן - אני רוצה להמשיך!", callback_data="pay_yes")],
-                [InlineKeyboardButton("❌ לא תודה", callback_data="pay_no")]
+                [InlineKeyboardButton(self.templates.render('button_pay_yes', language), callback_data="pay_yes")],
+                [InlineKeyboardButton(self.templates.render('button_pay_no', language), callback_data="pay_no")]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            reminder_message = f"""תמיכה שוק ההון:
-תקופת הניסיון שלך הסתיימה!
-
-היית בפנים 7 ימים, קיבלת עסקאות, ניתוחים, איתותים.
-ראית איך זה עובד באמת, לא סיפורים ולא חרטא,עסקאות בזמן אמת, יחס אישי.
-
-אבל עכשיו?
-פה זה הרגע שכולם נופלים בו:
-או שהם נשארים ומתחילים לראות תוצאות קבועות –
-או שהם יוצאים… וחוזרים לשחק אותה סולו, לנחש, להתבאס.
-
-במה אתה בוחר?
-"""
+            reminder_message = self.templates.render('trial_reminder', language, user_id, trial_days=TRIAL_DAYS)
             
             await self.application.bot.send_message(
                 chat_id=user_id,
@@ -361,53 +2165,39 @@ class PeakTradeBot:
                 reply_markup=reply_markup
             )
             
-            logger.info(f"✅ Payment reminder sent to user {user_id}")
+            logger.info("✅ Payment reminder sent to user %s", user_id, extra={'user_id': user_id})
             
         except Exception as e:
-            logger.error(f"❌ Error sending payment reminder to user {user_id}: {e}")
+            logger.error("❌ Error sending payment reminder to user %s: %s", user_id, e, extra={'user_id': user_id})
 
     async def send_final_payment_message(self, user_id):
         """שליחת הודעת תשלום סופית"""
         try:
-            final_message = f"""היי, כאן צוות חדר העסקאות – שוק ההון
-
-איך היה שבוע הניסיון? הרגשת שיפור בתיק שלך? קיבלת ידע וניתוחים שלא יצא לך לדעת? הרגשת יחס אישי?
-
-אם אתה רוצה להמשיך – העלות {MONTHLY_PRICE}₪ לחודש.
-
-קישור לתשלום:
-{PAYPAL_PAYMENT_LINK}
-
-מי שלא מחדש – מוסר אוטומטית.
-אחרי התשלום שלח צילום מסך"""
+            final_message = await self.render_for_user(
+                'final_payment', user_id,
+                price=MONTHLY_PRICE,
+                payment_link=payment_link_for(user_id)
+            )
             
             await self.application.bot.send_message(
                 chat_id=user_id,
                 text=final_message
             )
             
-            logger.info(f"✅ Final payment message sent to user {user_id}")
+            logger.info("✅ Final payment message sent to user %s", user_id, extra={'user_id': user_id})
             
         except Exception as e:
-            logger.error(f"❌ Error sending final payment message to user {user_id}: {e}")
+            logger.error("❌ Error sending final payment message to user %s: %s", user_id, e, extra={'user_id': user_id})
 
-    async def remove_user_after_trial(self, user_id, row_index=None):
-        """הסרת משתמש מהערוץ לאחר סיום תקופת ניסיון ללא תשלום"""
+    async def remove_from_channel(self, user_id, row_index, template, new_status):
+        """הסרת משתמש מהערוץ בסוף ניסיון או חודש ששולם בלי תשלום, ועדכון הסטטוס בגיליון"""
         try:
             await self.application.bot.ban_chat_member(
                 chat_id=CHANNEL_ID,
                 user_id=user_id
             )
             
-            goodbye_message = """👋 תקופת הניסיון שלך הסתיימה
-
-הוסרת מערוץ PeakTrade VIP מכיוון שלא חידשת את המנוי.
-
-💡 תמיד אפשר לחזור ולהירשם שוב!
-שלח /start כדי להתחיל מחדש.
-
-תודה שניסית את השירות שלנו! 🙏
-בהצלחה במסחר! 💪"""
+            goodbye_message = await self.render_for_user(template, user_id)
             
             try:
                 await self.application.bot.send_message(
@@ -420,50 +2210,150 @@ class PeakTradeBot:
             if row_index and self.sheet:
                 current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 try:
-                    self.sheet.update_cell(row_index, 8, "expired_no_payment")
+                    self.sheet.update_cell(row_index, 8, new_status)
                     self.sheet.update_cell(row_index, 11, current_time)
                 except Exception as update_error:
-                    logger.error(f"Error updating expiry status: {update_error}")
+                    logger.error("Error updating expiry status: %s", update_error)
+            
+            logger.info("✅ User %s removed from channel: %s", user_id, new_status, extra={'user_id': user_id})
+            
+        except Exception as e:
+            logger.error("❌ Error removing user %s: %s", user_id, e, extra={'user_id': user_id})
+
+    async def activate_paid_subscriber(self, user_id, renewal=False):
+        """הפעלה מיידית אחרי תשלום מאומת: unban, קישור חדש לערוץ והודעת אישור"""
+        self.lifecycle.schedule_renewal(user_id, datetime.now())
+        try:
+            await self.application.bot.unban_chat_member(
+                chat_id=CHANNEL_ID,
+                user_id=user_id,
+                only_if_banned=True
+            )
+            
+            if renewal:
+                message = await self.render_for_user('payment_renewed', user_id, price=MONTHLY_PRICE)
+            else:
+                invite_link = await self.application.bot.create_chat_invite_link(
+                    chat_id=CHANNEL_ID,
+                    member_limit=1,
+                    expire_date=int((datetime.now() + timedelta(days=2)).timestamp()),
+                    name=f"Paid_{user_id}"
+                )
+                message = await self.render_for_user('payment_activated', user_id, invite_link=invite_link.invite_link)
+            
+            await self.application.bot.send_message(
+                chat_id=user_id,
+                text=message,
+                disable_web_page_preview=True
+            )
+            
+            logger.info("✅ Paid subscription activated for user %s", user_id, extra={'user_id': user_id})
+            
+        except Exception as e:
+            logger.error("❌ Error activating paid subscriber %s: %s", user_id, e, extra={'user_id': user_id})
+
+    async def handle_payment_screenshot(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """צילומי מסך כבר לא נדרשים - התשלום מאומת אוטומטית מול PayPal"""
+        await update.message.reply_text(
+            await self.render_for_user('screenshot_received', update.effective_user.id)
+        )
+        logger.info("Payment screenshot received from user %s", update.effective_user.id, extra={'user_id': update.effective_user.id})
+
+    async def send_renewal_reminder(self, user_id):
+        """תזכורת חידוש יום לפני סוף החודש ששולם"""
+        try:
+            renewal_message = await self.render_for_user(
+                'renewal_reminder', user_id,
+                price=MONTHLY_PRICE,
+                payment_link=payment_link_for(user_id)
+            )
+            
+            await self.application.bot.send_message(
+                chat_id=user_id,
+                text=renewal_message
+            )
+            
+            logger.info("✅ Renewal reminder sent to user %s", user_id, extra={'user_id': user_id})
+            
+        except Exception as e:
+            logger.error("❌ Error sending renewal reminder to user %s: %s", user_id, e, extra={'user_id': user_id})
+
+    async def send_renewal_final_message(self, user_id):
+        """הודעה סופית יום אחרי סוף החודש ששולם - יום לפני ההסרה"""
+        try:
+            final_message = await self.render_for_user(
+                'renewal_final', user_id,
+                price=MONTHLY_PRICE,
+                payment_link=payment_link_for(user_id)
+            )
+            
+            await self.application.bot.send_message(
+                chat_id=user_id,
+                text=final_message
+            )
             
-            logger.info(f"✅ User {user_id} removed after trial expiry")
+            logger.info("✅ Final renewal message sent to user %s", user_id, extra={'user_id': user_id})
             
         except Exception as e:
-            logger.error(f"❌ Error removing user {user_id}: {e}")
+            logger.error("❌ Error sending final renewal message to user %s: %s", user_id, e, extra={'user_id': user_id})
 
     async def check_trial_expiry(self):
-        """בדיקה יומית של סיום תקופת ניסיון"""
+        """סנכרון מנוע מחזור החיים מול הגיליון - תזמון בלבד, השליחה נעשית בזמן המדויק של כל אירוע (True אם הצליח)"""
+        started = time.perf_counter()
         try:
+            await self.wait_for_sheets()
             if not self.sheet:
-                return
+                return False
             
-            records = self.sheet.get_all_records()
-            current_time = datetime.now()
+            records = await asyncio.to_thread(self.sheet.get_all_records)
+            last_payments = await asyncio.to_thread(self.cluster.store.last_payments)
+            self.lifecycle.rebuild(records, last_payments)
             
-            for i, record in enumerate(records):
-                if record.get('payment_status') == 'trial_active':
-                    trial_end_str = record.get('trial_end_date')
-                    if trial_end_str:
-                        try:
-                            trial_end = datetime.strptime(trial_end_str, "%Y-%m-%d %H:%M:%S")
-                            user_id = record.get('telegram_user_id')
-                            
-                            # יום לפני סיום הניסיון - הודעה ראשונה
-                            if (trial_end - current_time).days == 1:
-                                await self.send_trial_expiry_reminder(user_id)
-                            # יום אחרי סיום הניסיון - הודעה שנייה
-                            elif current_time > trial_end and (current_time - trial_end).days == 1:
-                                await self.send_final_payment_message(user_id)
-                            # יומיים אחרי סיום הניסיון - הסרה
-                            elif current_time > trial_end and (current_time - trial_end).days >= 2:
-                                await self.remove_user_after_trial(user_id, i + 2)
-                                
-                        except ValueError:
-                            logger.error(f"Invalid date format: {trial_end_str}")
-            
-            logger.info("✅ Trial expiry check completed")
+            logger.info("✅ Lifecycle resync completed: %s records, %s pending events", len(records), len(self.lifecycle.heap), extra={
+                'job': 'check_trial_expiry',
+                'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+            })
+            return True
             
         except Exception as e:
-            logger.error(f"❌ Error checking trial expiry: {e}")
+            logger.error("❌ Error checking trial expiry: %s", e)
+            return False
+
+    async def track_channel_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """מעקב אחרי הצטרפות/עזיבה/חסימה בערוץ (עדכוני chat_member)"""
+        member_update = update.chat_member
+        if str(member_update.chat.id) != str(CHANNEL_ID):
+            return
+        user_id = member_update.new_chat_member.user.id
+        status = ChannelReconciler.normalize_status(member_update.new_chat_member)
+        try:
+            await asyncio.to_thread(self.cluster.store.set_member_statuses, [(user_id, status)])
+        except sqlite3.Error as e:
+            logger.error("❌ Error tracking channel member %s: %s", user_id, e, extra={'user_id': user_id})
+        logger.info("Channel member %s is now %s", user_id, status, extra={'user_id': user_id, 'sample': 'chat_member'})
+
+    async def scheduled_channel_reconcile(self):
+        """התאמת חברות בערוץ - פעם אחת לכל חלון בכל ה-cluster"""
+        try:
+            await self.run_cluster_job(
+                'channel_reconcile',
+                datetime.now().strftime('%Y-%m-%d %H'),
+                self.reconciler.reconcile
+            )
+        except Exception as e:
+            logger.error("❌ Error reconciling channel members: %s", e)
+
+    async def run_cluster_job(self, job, slot, job_func):
+        """הרצת job פעם אחת בכל ה-cluster עבור חלון slot - מחזיר True אם רץ כאן"""
+        if not await self.cluster.claim(job, slot):
+            return False
+        await job_func()
+        return True
+
+    async def scheduled_lifecycle_resync(self):
+        """סנכרון תקופתי (לשינויים ידניים בגיליון) - רק אצל המנהיג, שהוא היחיד שיורה אירועים"""
+        if self.cluster.is_leader:
+            await self.check_trial_expiry()
 
     async def handle_payment_choice(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """טיפול בבחירת תשלום"""
@@ -472,25 +2362,17 @@ class PeakTradeBot:
         
         user_id = query.from_user.id
         choice = query.data
+        language = await self.language_for(user_id)
         
         if choice == "pay_yes":
             keyboard = [
-                [InlineKeyboardButton("💳 PayPal", url=PAYPAL_PAYMENT_LINK)],
+                [InlineKeyboardButton("💳 PayPal", url=payment_link_for(user_id))],
                 [InlineKeyboardButton("📱 Google Pay", callback_data="gpay_payment")],
-                [InlineKeyboardButton("❌ ביטול", callback_data="pay_cancel")]
+                [InlineKeyboardButton(self.templates.render('button_pay_cancel', language), callback_data="pay_cancel")]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            payment_message = f"""💳 תשלום PeakTrade VIP
-
-💰 מחיר: {MONTHLY_PRICE}₪/חודש
-⏰ חיוב חודשי אוטומטי
-
-📸 אחרי התשלום שלח צילום מסך
-
-🔒 תשלום מאובטח דרך:
-
-לחץ על אחת מהאפשרויות למטה:"""
+            payment_message = self.templates.render('payment_options', language, user_id, price=MONTHLY_PRICE)
             
             await query.edit_message_text(
                 text=payment_message,
@@ -498,55 +2380,107 @@ class PeakTradeBot:
             )
             
         elif choice == "pay_no":
-            goodbye_message = """👋 תודה שניסית את PeakTrade VIP!
-
-הבנו שאתה לא מעוניין להמשיך כרגע.
-תוסר מהערוץ הפרמיום מחר.
-
-💡 תמיד אפשר לחזור ולהירשם שוב!
-שלח /start כדי להתחיל מחדש.
-
-תודה ובהצלחה! 🙏"""
+            goodbye_message = self.templates.render('payment_declined', language, user_id)
             
             await query.edit_message_text(text=goodbye_message)
             
         elif choice == "gpay_payment":
             await query.edit_message_text(
-                text=f"📱 Google Pay זמין בקרוב!\n\nבינתיים אפשר לשלם דרך PayPal:\n{PAYPAL_PAYMENT_LINK}"
+                text=self.templates.render('gpay_unavailable', language, user_id, payment_link=payment_link_for(user_id))
             )
             
         elif choice == "pay_cancel":
             await query.edit_message_text(
-                text="❌ התשלום בוטל.\n\nתקבל תזכורת נוספת מחר."
+                text=self.templates.render('payment_cancelled', language, user_id)
             )
 
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """פקודת עזרה"""
-        help_text = f"""🆘 PeakTrade VIP Bot - מדריך מהיר
-
-📋 פקודות זמינות:
-/start - הצטרפות לערוץ הפרמיום
-/help - מדריך זה
-
-💎 מה מיוחד בערוץ שלנו:
-• המלצות מניות מנצחות
-• גרפים מקצועיים בזמן אמת
-• קהילת משקיעים פעילה
-
-⏰ תקופת ניסיון: 7 ימים חינם
-💰 מחיר מנוי: {MONTHLY_PRICE}₪/חודש
-
-🚀 הצטרף עכשיו ותתחיל להרוויח!"""
+        help_text = await self.render_for_user(
+            'help', update.effective_user.id,
+            trial_days=TRIAL_DAYS,
+            price=MONTHLY_PRICE
+        )
         
         await update.message.reply_text(help_text)
 
     async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """ביטול תהליך"""
         await update.message.reply_text(
-            "❌ התהליך בוטל. שלח /start כדי להתחיל מחדש."
+            await self.render_for_user('process_cancelled', update.effective_user.id)
         )
         return ConversationHandler.END
 
+    async def watch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """הוספת סימבולים למעקב: /watch AAPL TSLA"""
+        user_id = update.effective_user.id
+        symbols = [WatchlistEngine.normalize_symbol(arg) for arg in context.args]
+        symbols = [symbol for symbol in symbols if WatchlistEngine.valid_symbol(symbol)]
+        if not symbols:
+            await update.message.reply_text(await self.render_for_user('watch_usage', user_id))
+            return
+        try:
+            watching = await asyncio.to_thread(self.cluster.store.add_watch, user_id, symbols, WATCHLIST_MAX_SYMBOLS)
+        except sqlite3.Error as e:
+            logger.error("❌ Error updating watchlist for %s: %s", user_id, e, extra={'user_id': user_id})
+            await update.message.reply_text(await self.render_for_user('watch_error', user_id))
+            return
+        skipped = [symbol for symbol in symbols if symbol not in watching]
+        if skipped:
+            await update.message.reply_text(await self.render_for_user(
+                'watch_limit', user_id, max_symbols=WATCHLIST_MAX_SYMBOLS, skipped=', '.join(skipped)
+            ))
+        await self.reply_watchlist(update, watching)
+
+    async def unwatch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """הסרת סימבולים מהמעקב: /unwatch AAPL"""
+        user_id = update.effective_user.id
+        symbols = [WatchlistEngine.normalize_symbol(arg) for arg in context.args]
+        if not symbols:
+            await update.message.reply_text(await self.render_for_user('watch_usage', user_id))
+            return
+        try:
+            await asyncio.to_thread(self.cluster.store.remove_watch, [user_id], symbols)
+            watching = await asyncio.to_thread(self.cluster.store.watched_symbols, user_id)
+        except sqlite3.Error as e:
+            logger.error("❌ Error updating watchlist for %s: %s", user_id, e, extra={'user_id': user_id})
+            await update.message.reply_text(await self.render_for_user('watch_error', user_id))
+            return
+        await self.reply_watchlist(update, watching)
+
+    async def watchlist_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """הצגת הסימבולים במעקב"""
+        try:
+            watching = await asyncio.to_thread(self.cluster.store.watched_symbols, update.effective_user.id)
+        except sqlite3.Error as e:
+            logger.error("❌ Error reading watchlist: %s", e, extra={'user_id': update.effective_user.id})
+            await update.message.reply_text(await self.render_for_user('watch_error', update.effective_user.id))
+            return
+        await self.reply_watchlist(update, watching)
+
+    async def reply_watchlist(self, update, watching):
+        user_id = update.effective_user.id
+        if not watching:
+            await update.message.reply_text(await self.render_for_user('watchlist_empty', user_id))
+            return
+        await update.message.reply_text(await self.render_for_user(
+            'watchlist_show', user_id,
+            symbols=', '.join(watching),
+            count=len(watching),
+            max_symbols=WATCHLIST_MAX_SYMBOLS
+        ))
+
+    async def resync_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/resync למנהלים - סנכרון מלא של מנוע מחזור החיים אחרי עריכה ידנית בגיליון"""
+        user_id = update.effective_user.id
+        if user_id not in ADMIN_USER_IDS:
+            return
+        # המנהיג (אולי ב-worker אחר) קורא את הבקשה מה-store המשותף
+        await asyncio.to_thread(self.cluster.store.set_value, 'lifecycle_resync_at', time.time())
+        self.lifecycle.wakeup.set()
+        logger.info("🔄 Lifecycle resync requested by admin %s", user_id, extra={'user_id': user_id})
+        await update.message.reply_text(await self.render_for_user('resync_requested', user_id))
+
     def setup_handlers(self):
         """הגדרת handlers"""
         conv_handler = ConversationHandler(
@@ -564,12 +2498,19 @@ class PeakTradeBot:
         
         self.application.add_handler(conv_handler)
         self.application.add_handler(CommandHandler('help', self.help_command))
+        self.application.add_handler(CommandHandler('resync', self.resync_command, filters.ChatType.PRIVATE))
+        self.application.add_handler(CommandHandler('watch', self.watch_command, filters.ChatType.PRIVATE))
+        self.application.add_handler(CommandHandler('unwatch', self.unwatch_command, filters.ChatType.PRIVATE))
+        self.application.add_handler(CommandHandler('watchlist', self.watchlist_command, filters.ChatType.PRIVATE))
         self.application.add_handler(CallbackQueryHandler(self.handle_payment_choice))
+        self.application.add_handler(MessageHandler(filters.PHOTO & filters.ChatType.PRIVATE, self.handle_payment_screenshot))
+        self.application.add_handler(ChatMemberHandler(self.track_channel_member, ChatMemberHandler.CHAT_MEMBER))
         
         logger.info("✅ All handlers configured")
 
     async def send_guaranteed_stock_content(self):
         """שליחת תוכן מניה מקצועי עם Twelve Data"""
+        started = time.perf_counter()
         try:
             logger.info("📈 Preparing stock content with Twelve Data...")
             
@@ -681,10 +2622,10 @@ class PeakTradeBot:
                 stock_type = selected['type']
                 sector = selected['sector']
                 
-                data = self.twelve_api.get_stock_data(symbol)
+                data = await asyncio.to_thread(self.twelve_api.get_stock_data, symbol)
                 
                 if data is None or data.empty:
-                    logger.warning(f"No Twelve Data for {symbol}")
+                    logger.warning("No Twelve Data for %s", symbol, extra={'symbol': symbol})
                     await self.send_text_analysis(symbol, stock_type)
                     return
                 
@@ -695,8 +2636,8 @@ class PeakTradeBot:
                 change_percent = (change / data['Close'][-2] * 100) if len(data) > 1 and data['Close'][-2] != 0 else 0
                 volume = data['Volume'][-1] if len(data) > 0 else 0
                 
-                high_30d = data['High'].max()
-                low_30d = data['Low'].min()
+                period_high = data['High'].max()
+                period_low = data['Low'].min()
                 avg_volume = data['Volume'].mean()
                 
                 entry_price = current_price * 1.02
@@ -708,30 +2649,41 @@ class PeakTradeBot:
                 reward = profit_target_1 - entry_price
                 risk_reward = reward / risk if risk > 0 else 0
                 
-                chart_buffer = self.create_professional_chart_with_prices(symbol, data, current_price, entry_price, stop_loss, profit_target_1, profit_target_2)
+                chart_buffer = await asyncio.to_thread(
+                    self.create_professional_chart_with_prices,
+                    symbol, data, current_price, entry_price, stop_loss, profit_target_1, profit_target_2,
+                    timeframe=SIGNAL_TIMEFRAME
+                )
                 
-                caption = f"""🔥 {stock_type} - המלצת השקעה חמה!
-
-💎 סקטור: {sector} | מחיר נוכחי: ${current_price:.2f}
-
-📊 ניתוח טכני מקצועי (30 ימים):
-• טווח מחירים: ${low_30d:.2f} - ${high_30d:.2f}
-• נפח מסחר ממוצע: {avg_volume:,.0f}
-• נפח היום: {volume:,.0f}
-• מומנטום: {'חיובי 📈' if change_percent > 0 else 'שלילי 📉'} ({change_percent:+.2f}%)
-
-🎯 אסטרטגיית המסחר שלנו:
-🟢 נקודת כניסה: ${entry_price:.2f}
-🔴 סטופלוס מומלץ: ${stop_loss:.2f}
-🎯 יעד ראשון: ${profit_target_1:.2f}
-🚀 יעד שני: ${profit_target_2:.2f}
-
-💰 פוטנציאל רווח: ${reward:.2f} למניה
-💸 סיכון מקסימלי: ${risk:.2f} למניה
-
-🔥 זוהי המלצה בלעדית לחברי PeakTrade VIP!
-
-#PeakTradeVIP #{symbol} #HotStock"""
+                caption = self.templates.render(
+                    'stock_signal', CHANNEL_LANGUAGE,
+                    stock_type=stock_type,
+                    sector=sector,
+                    current_price=current_price,
+                    low=period_low,
+                    high=period_high,
+                    avg_volume=avg_volume,
+                    period=self.templates.render(f'period_{SIGNAL_TIMEFRAME}', CHANNEL_LANGUAGE, count=len(data)),
+                    volume_label=self.templates.render('volume_today' if SIGNAL_TIMEFRAME == '1day' else 'volume_last_bar', CHANNEL_LANGUAGE),
+                    volume=volume,
+                    momentum=self.templates.render('momentum_up' if change_percent > 0 else 'momentum_down', CHANNEL_LANGUAGE),
+                    change_percent=change_percent,
+                    entry_price=entry_price,
+                    stop_loss=stop_loss,
+                    target_1=profit_target_1,
+                    target_2=profit_target_2,
+                    reward=reward,
+                    risk=risk,
+                    symbol=symbol
+                )
+                alert = dict(
+                    current_price=current_price,
+                    change_percent=change_percent,
+                    entry_price=entry_price,
+                    stop_loss=stop_loss,
+                    target_1=profit_target_1,
+                    target_2=profit_target_2
+                )
                 
                 if chart_buffer:
                     await self.application.bot.send_photo(
@@ -739,13 +2691,22 @@ class PeakTradeBot:
                         photo=chart_buffer,
                         caption=caption
                     )
-                    logger.info(f"✅ Twelve Data stock content sent for {symbol}")
+                    logger.info("✅ Twelve Data stock content sent for %s", symbol, extra={
+                        'symbol': symbol,
+                        'job': 'broadcast',
+                        'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+                    })
                 else:
                     await self.application.bot.send_message(
                         chat_id=CHANNEL_ID,
                         text=caption
                     )
-                    logger.info(f"✅ Twelve Data stock content (text) sent for {symbol}")
+                    logger.info("✅ Twelve Data stock content (text) sent for %s", symbol, extra={
+                        'symbol': symbol,
+                        'job': 'broadcast',
+                        'latency_ms': round((time.perf_counter() - started) * 1000, 1)
+                    })
+                self.watchlist.publish(symbol, **alert)
             
             else:  # קריפטו
                 selected = random.choice(premium_crypto)
@@ -756,108 +2717,131 @@ class PeakTradeBot:
                 await self.send_crypto_analysis(symbol, crypto_name, crypto_type)
             
         except Exception as e:
-            logger.error(f"❌ Error sending Twelve Data stock content: {e}")
+            logger.error("❌ Error sending Twelve Data stock content: %s", e)
 
     async def send_crypto_analysis(self, symbol, crypto_name, crypto_type):
         """שליחת ניתוח קריפטו"""
         try:
-            message = f"""🪙 {crypto_type} - אות קנייה בלעדי!
-
-💎 מטבע: {symbol.replace('/USD', '')} | מחיר נוכחי: מעודכן בזמן אמת
-
-📊 ניתוח קריפטו מקצועי:
-• מומנטום: מתחזק 🚀
-• נפח מסחר: גבוה
-• טרנד: חיובי לטווח הקצר
-
-🎯 אסטרטגיית הקריפטו שלנו:
-🟢 כניסה מומלצת: +3% מהמחיר הנוכחי
-🔴 סטופלוס חכם: -8% מהמחיר הנוכחי
-🎯 יעד ראשון: +12% רווח
-🚀 יעד שני: +25% רווח מקסימלי
-
-⚠️ קריפטו - סיכון גבוה, פוטנציאל רווח גבוה
-🔥 זוהי המלצה בלעדית לחברי VIP!
-
-#PeakTradeVIP #{crypto_name} #CryptoSignal"""
+            message = self.templates.render(
+                'crypto_signal', CHANNEL_LANGUAGE,
+                crypto_type=crypto_type,
+                coin=symbol.replace('/USD', ''),
+                crypto_name=crypto_name
+            )
             
             await self.application.bot.send_message(
                 chat_id=CHANNEL_ID,
                 text=message
             )
             
-            logger.info(f"✅ Crypto analysis sent for {symbol}")
+            logger.info("✅ Crypto analysis sent for %s", symbol, extra={'symbol': symbol})
+            self.watchlist.publish(symbol)
             
         except Exception as e:
-            logger.error(f"❌ Error sending crypto analysis: {e}")
+            logger.error("❌ Error sending crypto analysis: %s", e)
 
     async def send_text_analysis(self, symbol, asset_type):
         """שליחת ניתוח טקסט אם הגרף נכשל"""
         try:
-            message = f"""{asset_type} 📈 - המלצה חמה!
-
-💰 מחיר נוכחי: מעודכן בזמן אמת
-📊 ניתוח טכני מקצועי
-
-🎯 המלצות המסחר שלנו:
-🟢 כניסה מומלצת: +2% מהמחיר הנוכחי
-🔴 סטופלוס חכם: -5% מהמחיר הנוכחי
-🎯 יעד ראשון: +8% רווח יפה
-🚀 יעד שני: +15% רווח מקסימלי
-
-🔥 זוהי המלצה בלעדית לחברי VIP!
-
-#PeakTradeVIP #{symbol.replace('/USD', '').replace('.TA', '')} #HotStock"""
+            message = self.templates.render(
+                'text_signal', CHANNEL_LANGUAGE,
+                asset_type=asset_type,
+                tag=symbol.replace('/USD', '').replace('.TA', '')
+            )
             
             await self.application.bot.send_message(
                 chat_id=CHANNEL_ID,
                 text=message
             )
             
-            logger.info(f"✅ Text analysis sent for {symbol}")
+            logger.info("✅ Text analysis sent for %s", symbol, extra={'symbol': symbol})
+            self.watchlist.publish(symbol)
             
         except Exception as e:
-            logger.error(f"❌ Error sending text analysis: {e}")
+            logger.error("❌ Error sending text analysis: %s", e)
 
     async def run(self):
         """הפעלת הבוט עם Twelve Data"""
-        logger.info("🚀 Starting PeakTrade VIP Bot with Twelve Data...")
+        logger.info("🚀 Starting PeakTrade VIP Bot with Twelve Data (worker %s/%s)...", self.worker_index, self.worker_count)
         
-        self.application = Application.builder().token(BOT_TOKEN).build()
-        self.setup_handlers()
+        holder = f"{socket.gethostname()}:{os.getpid()}:{self.worker_index}"
+        self.cluster = ClusterCoordinator(ClusterStore(CLUSTER_DB_PATH, holder), self.worker_index, self.worker_count)
+        await self.cluster.refresh_leadership()
         
-        # הגדרת scheduler לבדיקת תפוגת ניסיונות
-        self.scheduler = AsyncIOScheduler(timezone="Asia/Jerusalem")
-        
-        self.scheduler.add_job(
-            self.check_trial_expiry,
-            CronTrigger(hour=9, minute=0),
-            id='check_trial_expiry'
-        )
-        
-        self.scheduler.start()
-        logger.info("✅ Trial expiry scheduler configured")
+        builder = Application.builder().token(BOT_TOKEN)
+        if self.worker_count > 1:
+            # במצב cluster אין Updater מקומי - המנהיג מושך updates לתור המשותף
+            builder = builder.updater(None)
+        self.application = builder.build()
+        self.setup_handlers()
         
         try:
+            # קודם כל polling - החיבור ל-Sheets וטעינת המודולים הכבדים ממשיכים ברקע
             await self.application.initialize()
             await self.application.start()
-            await self.application.updater.start_polling()
+            if self.application.updater:
+                await self.application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            else:
+                self.background_tasks += [
+                    asyncio.create_task(self.cluster.poll_updates(self.application.bot)),
+                    asyncio.create_task(self.cluster.consume_updates(self.application))
+                ]
+            logger.info("✅ Polling started", extra={
+                'job': 'startup',
+                'latency_ms': round((time.perf_counter() - PROCESS_STARTED) * 1000, 1)
+            })
+            
+            self.background_tasks += [
+                asyncio.create_task(self.cluster.run_lease_loop()),
+                asyncio.create_task(self.connect_google_sheets()),
+                asyncio.create_task(self.warm_up_heavy_modules())
+            ]
+            
+            # שרת התשלומים רץ רק ב-worker 0 (פורט אחד לכל ה-cluster)
+            if PAYMENT_SERVER_PORT and self.worker_index == 0:
+                self.payments = PaymentPipeline(self)
+                self.payment_server = PaymentServer(self.payments, PAYMENT_SERVER_PORT)
+                await self.payment_server.start()
+                self.background_tasks.append(asyncio.create_task(self.payments.run_batcher()))
+            elif not PAYMENT_SERVER_PORT:
+                logger.warning("⚠️ PAYMENT_SERVER_PORT not set - automatic payment verification disabled")
+            
+            # מנוע מחזור החיים יורה כל אירוע בזמנו; ה-scheduler רק מסנכרן מול הגיליון
+            self.background_tasks.append(asyncio.create_task(self.lifecycle.run()))
+            # התראות watchlist יוצאות מה-worker שפרסם את האות
+            self.background_tasks.append(asyncio.create_task(self.watchlist.run()))
+            self.scheduler = AsyncIOScheduler(timezone="Asia/Jerusalem")
+            
+            self.scheduler.add_job(
+                self.scheduled_lifecycle_resync,
+                IntervalTrigger(hours=LIFECYCLE_RESYNC_HOURS),
+                id='lifecycle_resync'
+            )
+            self.scheduler.add_job(
+                self.scheduled_channel_reconcile,
+                IntervalTrigger(hours=RECONCILE_INTERVAL_HOURS),
+                id='channel_reconcile'
+            )
+            
+            self.scheduler.start()
+            logger.info("✅ Lifecycle engine and resync scheduler configured")
             
             logger.info("✅ PeakTrade VIP Bot is running successfully!")
             logger.info("📊 Twelve Data API integrated - 800 calls/day")
             logger.info("📊 Content: Every 30 minutes between 10:00-22:00")
             logger.info("📊 Stock pool: 60+ stocks from all sectors")
             logger.info("📊 Crypto pool: 10+ major cryptocurrencies")
-            logger.info("⏰ Trial expiry check: Daily at 9:00 AM")
-            logger.info(f"💰 Monthly subscription: {MONTHLY_PRICE}₪")
+            logger.info("⏰ Lifecycle events: exact-time, resync every %s hours", LIFECYCLE_RESYNC_HOURS)
+            logger.info("💰 Monthly subscription: %s₪", MONTHLY_PRICE)
             
-            # שליחת הודעת בדיקה מיידית
+            # שליחת הודעת בדיקה מיידית (רק המנהיג)
             await asyncio.sleep(10)
-            try:
-                await self.send_guaranteed_stock_content()
-                logger.info("✅ Immediate Twelve Data test sent")
-            except Exception as e:
-                logger.error(f"❌ Test error: {e}")
+            if self.cluster.is_leader:
+                try:
+                    await self.send_guaranteed_stock_content()
+                    logger.info("✅ Immediate Twelve Data test sent")
+                except Exception as e:
+                    logger.error("❌ Test error: %s", e)
             
             # לולאה עם שליחה מאולצת כל 30 דקות
             last_send_time = datetime.now()
@@ -868,30 +2852,76 @@ class PeakTradeBot:
                 if (current_time - last_send_time).total_seconds() >= 1800:  # 30 דקות
                     if 10 <= current_time.hour < 22:
                         try:
-                            logger.info(f"🕐 Forcing Twelve Data content at {current_time.strftime('%H:%M')}")
-                            await self.send_guaranteed_stock_content()
+                            # חלון של חצי שעה - פרסום אחד לכל חלון בכל ה-cluster
+                            slot = current_time.replace(minute=current_time.minute // 30 * 30).strftime('%Y-%m-%d %H:%M')
+                            if await self.run_cluster_job('broadcast', slot, self.send_guaranteed_stock_content):
+                                logger.info("✅ Forced Twelve Data content sent successfully!", extra={'job': 'broadcast'})
                             last_send_time = current_time
-                            logger.info("✅ Forced Twelve Data content sent successfully!")
                         except Exception as e:
-                            logger.error(f"❌ Error in forced Twelve Data send: {e}")
+                            logger.error("❌ Error in forced Twelve Data send: %s", e)
                 
                 await asyncio.sleep(60)
                 
         except Exception as e:
-            logger.error(f"❌ Bot error: {e}")
+            logger.error("❌ Bot error: %s", e)
         finally:
+            for task in self.background_tasks:
+                task.cancel()
             if self.scheduler:
                 self.scheduler.shutdown()
+            if self.payment_server:
+                await self.payment_server.stop()
+            if self.cluster:
+                await self.cluster.release()
             if self.application:
-                await self.application.updater.stop()
+                if self.application.updater:
+                    await self.application.updater.stop()
                 await self.application.stop()
                 await self.application.shutdown()
 
-if __name__ == "__main__":
-    bot = PeakTradeBot()
+def run_worker(worker_index=0, worker_count=1):
+    """הרצת worker יחיד - תהליך יחיד רגיל או אחד מה-workers במצב cluster"""
+    bot = PeakTradeBot(worker_index, worker_count)
     try:
         asyncio.run(bot.run())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
-        logger.error(f"Fatal error: {e}")
+        logger.error("Fatal error: %s", e)
+    finally:
+        log_listener.stop()
+
+def run_cluster(worker_count):
+    """הפעלת worker_count תהליכים על אותו CLUSTER_DB_PATH והפעלה מחדש של worker שנפל"""
+    context = multiprocessing.get_context('spawn')
+    workers = {}
+    try:
+        while True:
+            for index in range(worker_count):
+                process = workers.get(index)
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    logger.warning("⚠️ Worker %s exited with code %s, restarting", index, process.exitcode)
+                process = context.Process(target=run_worker, args=(index, worker_count), name=f"worker-{index}")
+                # תהליך spawn יורש את הסביבה ברגע ה-start - כך ה-worker יודע את האינדקס שלו כבר ב-import (לקובץ הלוג)
+                os.environ['WORKER_INDEX'] = str(index)
+                try:
+                    process.start()
+                finally:
+                    del os.environ['WORKER_INDEX']
+                workers[index] = process
+            time.sleep(5)
+    except KeyboardInterrupt:
+        logger.info("Cluster stopped by user")
+    finally:
+        for process in workers.values():
+            process.terminate()
+            process.join()
+        log_listener.stop()
+
+if __name__ == "__main__":
+    if WORKER_COUNT > 1 and WORKER_INDEX is None:
+        run_cluster(WORKER_COUNT)
+    else:
+        run_worker(int(WORKER_INDEX or 0), WORKER_COUNT)
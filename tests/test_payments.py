@@ -0,0 +1,101 @@
+import asyncio
+from urllib.parse import urlencode
+
+import bot_only
+
+
+class FakeSheet:
+    def __init__(self, records):
+        self.records = records
+        self.updates = []
+
+    def get_all_records(self):
+        return self.records
+
+    def batch_update(self, updates):
+        self.updates.extend(updates)
+
+
+class FakeCluster:
+    def __init__(self, store):
+        self.store = store
+
+
+class FakeBot:
+    def __init__(self, store, sheet):
+        self.cluster = FakeCluster(store)
+        self.sheet = sheet
+        self.activated = []
+
+    async def wait_for_sheets(self):
+        pass
+
+    async def activate_paid_subscriber(self, user_id, renewal=False):
+        self.activated.append((user_id, renewal))
+
+
+def ipn_body(txn_id='TXN1', user_id='42'):
+    return urlencode({
+        'payment_status': 'Completed',
+        'receiver_email': 'shop@example.com',
+        'txn_id': txn_id,
+        'custom': user_id,
+        'payer_email': 'payer@example.com',
+        'mc_gross': str(bot_only.MONTHLY_PRICE),
+        'mc_currency': bot_only.PAYMENT_CURRENCY
+    }).encode()
+
+
+def make_pipeline(tmp_path, monkeypatch, verify=lambda body: True):
+    monkeypatch.setattr(bot_only, 'PAYPAL_BUSINESS_EMAIL', 'shop@example.com')
+    store = bot_only.ClusterStore(str(tmp_path / 'cluster.db'), 'test')
+    sheet = FakeSheet([{'telegram_user_id': 42, 'email': 'payer@example.com', 'payment_status': 'trial_active'}])
+    pipeline = bot_only.PaymentPipeline(FakeBot(store, sheet))
+    monkeypatch.setattr(pipeline, 'verify_ipn', verify)
+    return pipeline
+
+
+def test_ipn_is_stored_before_ack_and_activates(tmp_path, monkeypatch):
+    async def scenario():
+        pipeline = make_pipeline(tmp_path, monkeypatch)
+        assert await pipeline.handle_ipn({}, ipn_body()) == 200
+        assert [p['txn_id'] for p in pipeline.bot.cluster.store.pending_payments()] == ['TXN1']
+
+        assert await pipeline.apply_batch([pipeline.pending.get_nowait()]) == []
+        return pipeline
+
+    pipeline = asyncio.run(scenario())
+    assert pipeline.bot.activated == [(42, False)]
+    assert {'range': 'H2', 'values': [['paid_subscriber']]} in pipeline.bot.sheet.updates
+    assert pipeline.bot.cluster.store.pending_payments() == []
+
+
+def test_ipn_verification_failure_asks_paypal_to_retry(tmp_path, monkeypatch):
+    def unreachable(body):
+        raise ConnectionError("paypal down")
+
+    async def scenario():
+        pipeline = make_pipeline(tmp_path, monkeypatch, verify=unreachable)
+        return pipeline, await pipeline.handle_ipn({}, ipn_body())
+
+    pipeline, status = asyncio.run(scenario())
+    assert status == 503
+    assert pipeline.pending.empty()
+    assert pipeline.bot.cluster.store.pending_payments() == []
+
+
+def test_stored_payment_survives_restart(tmp_path, monkeypatch):
+    async def before_crash():
+        pipeline = make_pipeline(tmp_path, monkeypatch)
+        assert await pipeline.handle_ipn({}, ipn_body()) == 200
+
+    async def after_restart():
+        pipeline = make_pipeline(tmp_path, monkeypatch)
+        await pipeline.restore_pending()
+        assert await pipeline.apply_batch([pipeline.pending.get_nowait()]) == []
+        return pipeline
+
+    asyncio.run(before_crash())
+    pipeline = asyncio.run(after_restart())
+    assert pipeline.bot.activated == [(42, False)]
+    assert pipeline.bot.cluster.store.pending_payments() == []
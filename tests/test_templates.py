@@ -0,0 +1,37 @@
+import os
+
+import bot_only
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+    # mtime חדש גם כשהכתיבה באותה שנייה
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+
+def test_broken_template_keeps_previous_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot_only, 'TEMPLATE_RELOAD_SECONDS', 0)
+    write(tmp_path / 'en' / 'greeting.txt', "hello {who}")
+    write(tmp_path / 'en' / 'farewell.txt', "bye {who}")
+    store = bot_only.TemplateStore(str(tmp_path), default_language='en')
+    assert store.render('greeting', 'en', who='Dana') == "hello Dana"
+
+    write(tmp_path / 'en' / 'greeting.txt', "hello {who!}")
+    write(tmp_path / 'en' / 'farewell.txt', "goodbye {who}")
+
+    assert store.render('greeting', 'en', who='Dana') == "hello Dana"
+    assert store.render('farewell', 'en', who='Dana') == "goodbye Dana"
+
+
+def test_broken_variant_keeps_all_previous_variants(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot_only, 'TEMPLATE_RELOAD_SECONDS', 0)
+    write(tmp_path / 'en' / 'offer.txt', "A {price}")
+    write(tmp_path / 'en' / 'offer.b.txt', "B {price}")
+    store = bot_only.TemplateStore(str(tmp_path), default_language='en')
+
+    write(tmp_path / 'en' / 'offer.b.txt', "B {price!}")
+
+    rendered = {store.render('offer', 'en', user_id, price=1) for user_id in range(50)}
+    assert rendered == {"A 1", "B 1"}